@@ -134,9 +134,16 @@ Return list format:
 No other text or explanation.
 """
 
-        response = self.llm_client.complete(action_prompt)
-        cleaned_response = self._clean_response(response)
-        instruction = json.loads(cleaned_response)
+        def compute_action():
+            response = self._complete(action_prompt)
+            cleaned_response = self._clean_response(response)
+            result = json.loads(cleaned_response)
+            if isinstance(result, list) is False:
+                raise ValueError("Invalid instruction format")
+            return result
+
+        # Use cache manager to get or compute the instruction
+        instruction = self._get_cached_or_compute(prompt, context, compute_action)
 
         if isinstance(instruction, list) is False:
             raise ValueError("Invalid instruction format")
@@ -234,38 +241,42 @@ Return format:
 No other text or explanation.
 """
 
-        response = self.llm_client.complete(query_prompt)
-        cleaned_response = self._clean_response(response)
-        try:
-            result = json.loads(cleaned_response)
-            query_info = self._validate_result_format(result, format_hint)
-            logger.debug(f"📄 Query: {query_info}")
-            return query_info
-        except json.JSONDecodeError:
-            # If it's a string array format, try extracting from text
-            if format_hint == 'string[]':
-                lines = [line.strip() for line in cleaned_response.split('\n')
-                         if line.strip() and not line.startswith(('-', '*', '#'))]
-
-                query_terms = [term.lower() for term in prompt.split()
-                               if len(term) > 2 and term.lower() not in ['the', 'and', 'for']]
-
-                results = []
-                for line in lines:
-                    if any(term in line.lower() for term in query_terms):
-                        text = line.strip('`"\'- ,')
-                        if ':' in text:
-                            text = text.split(':', 1)[1].strip()
-                        if text:
-                            results.append(text)
-
-                if results:
-                    seen = set()
-                    query_info = [x for x in results if not (x in seen or seen.add(x))]
-                    logger.debug(f"📄 Query: {query_info}")
-                    return query_info
-
-            raise ValueError(f"Failed to parse response as JSON: {cleaned_response[:100]}...")
+        def compute_query():
+            response = self._complete(query_prompt)
+            cleaned_response = self._clean_response(response)
+            try:
+                result = json.loads(cleaned_response)
+                query_info = self._validate_result_format(result, format_hint)
+                logger.debug(f"📄 Query: {query_info}")
+                return query_info
+            except json.JSONDecodeError:
+                # If it's a string array format, try extracting from text
+                if format_hint == 'string[]':
+                    lines = [line.strip() for line in cleaned_response.split('\n')
+                             if line.strip() and not line.startswith(('-', '*', '#'))]
+
+                    query_terms = [term.lower() for term in prompt.split()
+                                   if len(term) > 2 and term.lower() not in ['the', 'and', 'for']]
+
+                    results = []
+                    for line in lines:
+                        if any(term in line.lower() for term in query_terms):
+                            text = line.strip('`"\'- ,')
+                            if ':' in text:
+                                text = text.split(':', 1)[1].strip()
+                            if text:
+                                results.append(text)
+
+                    if results:
+                        seen = set()
+                        query_info = [x for x in results if not (x in seen or seen.add(x))]
+                        logger.debug(f"📄 Query: {query_info}")
+                        return query_info
+
+                raise ValueError(f"Failed to parse response as JSON: {cleaned_response[:100]}...")
+
+        return self._get_cached_or_compute(prompt, context, compute_query,
+                                           operation="query", format_hint=format_hint)
 
     def ai_assert(self, prompt: str) -> bool:
         """
@@ -296,22 +307,25 @@ Assertion: {prompt}
 IMPORTANT: Return ONLY the word 'true' or 'false' (lowercase). No other text, no explanation.
 """
 
-        response = self.llm_client.complete(assert_prompt)
-        cleaned_response = self._clean_response(response).lower()
+        def compute_assert():
+            response = self._complete(assert_prompt)
+            cleaned_response = self._clean_response(response).lower()
+
+            # Directly match true or false
+            if cleaned_response == 'true':
+                return True
+            if cleaned_response == 'false':
+                return False
 
-        # Directly match true or false
-        if cleaned_response == 'true':
-            return True
-        if cleaned_response == 'false':
-            return False
+            # If response contains other content, try extracting boolean
+            if 'true' in cleaned_response.split():
+                return True
+            if 'false' in cleaned_response.split():
+                return False
 
-        # If response contains other content, try extracting boolean
-        if 'true' in cleaned_response.split():
-            return True
-        if 'false' in cleaned_response.split():
-            return False
+            raise ValueError("Response must be 'true' or 'false'")
 
-        raise ValueError("Response must be 'true' or 'false'")
+        return self._get_cached_or_compute(prompt, context, compute_assert, operation="assert")
 
 
 def create_fixture():
@@ -0,0 +1,11 @@
+from autowing.core.cache.bundle import filter_records, read_bundle, read_bundle_header, write_bundle
+from autowing.core.cache.cache_manager import CacheManagerRegistry, IntelligentCacheManager
+
+__all__ = [
+    "IntelligentCacheManager",
+    "CacheManagerRegistry",
+    "filter_records",
+    "read_bundle",
+    "read_bundle_header",
+    "write_bundle",
+]
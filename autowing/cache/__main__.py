@@ -0,0 +1,62 @@
+"""
+Export and import auto-wing cache bundles.
+
+run:
+> python -m autowing.cache export cache-bundle.gz --url "https://example.com/*" --max-age-days 7
+> python -m autowing.cache import cache-bundle.gz --cache-dir .auto-wing/cache
+> python -m autowing.cache info cache-bundle.gz
+"""
+import argparse
+import json
+import sys
+
+from autowing.core.cache.bundle import read_bundle_header
+from autowing.core.cache.cache_manager import IntelligentCacheManager
+
+DEFAULT_CACHE_DIR = ".auto-wing/cache"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m autowing.cache", description="auto-wing cache bundles")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="export the cache into a bundle")
+    export_parser.add_argument("bundle", help="bundle file to write")
+    export_parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    export_parser.add_argument("--url", dest="url_pattern", help="shell-style URL pattern, e.g. 'https://example.com/*'")
+    export_parser.add_argument("--max-age-days", type=float, help="only entries created in the last N days")
+    export_parser.add_argument("--min-usage", type=int, help="only entries used at least N times")
+
+    import_parser = commands.add_parser("import", help="merge a bundle into the cache")
+    import_parser.add_argument("bundle", help="bundle file to read")
+    import_parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+
+    info_parser = commands.add_parser("info", help="show the header of a bundle")
+    info_parser.add_argument("bundle", help="bundle file to read")
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "info":
+            print(json.dumps(read_bundle_header(args.bundle), indent=2, ensure_ascii=False))
+            return 0
+
+        # Exporting never writes to the cache
+        manager = IntelligentCacheManager(cache_dir=args.cache_dir, read_only=args.command == "export")
+        try:
+            if args.command == "export":
+                count = manager.export_bundle(args.bundle, url_pattern=args.url_pattern,
+                                              max_age_days=args.max_age_days, min_usage=args.min_usage)
+                print(f"Exported {count} entries into {args.bundle}")
+            else:
+                count = manager.import_bundle(args.bundle)
+                print(f"Imported {count} entries into {args.cache_dir}")
+        finally:
+            manager.close()
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
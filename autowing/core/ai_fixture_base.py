@@ -1,8 +1,11 @@
-from typing import Any
+import json
+import time
+from typing import Any, Optional, Tuple
 
 from loguru import logger
 
-from autowing.core.cache.cache_manager import IntelligentCacheManager
+from autowing.core.cache.cache_manager import CacheManagerRegistry, IntelligentCacheManager
+from autowing.core.element_ranker import ElementSelection
 
 
 class AiFixtureBase:
@@ -13,7 +16,72 @@ class AiFixtureBase:
 
     def __init__(self):
         """Initialize the base fixture with intelligent cache support."""
-        self.cache_manager = IntelligentCacheManager()
+        # The cache manager is obtained on first use, fixtures that never hit the cache don't pay for it
+        self._cache_manager = None
+        self._shared_cache_manager = False
+        # Estimated tokens of the prompts sent to the LLM by the running computation
+        self._sent_tokens = 0
+
+    @property
+    def cache_manager(self) -> IntelligentCacheManager:
+        """The intelligent cache manager, shared by all fixtures of the process."""
+        if self._cache_manager is None:
+            self._cache_manager = CacheManagerRegistry.acquire()
+            self._shared_cache_manager = True
+        return self._cache_manager
+
+    @cache_manager.setter
+    def cache_manager(self, cache_manager: IntelligentCacheManager) -> None:
+        self._release_cache_manager()
+        self._cache_manager = cache_manager
+
+    def _release_cache_manager(self) -> None:
+        """Give back the shared cache manager, if this fixture holds one."""
+        if self._cache_manager is not None and self._shared_cache_manager:
+            CacheManagerRegistry.release(self._cache_manager)
+        self._cache_manager = None
+        self._shared_cache_manager = False
+
+    def close(self) -> None:
+        """
+        Release the resources held by the fixture.
+        The shared cache manager is closed once no fixture uses it anymore.
+        """
+        self._release_cache_manager()
+
+    def get_cache_statistics(self) -> dict:
+        """
+        Get cache usage statistics.
+
+        Returns:
+            Dictionary containing cache statistics
+        """
+        return self.cache_manager.get_statistics()
+
+    @staticmethod
+    def _estimate_tokens(*texts: str) -> int:
+        """
+        Roughly estimate the LLM tokens of some texts:
+        about 4 ASCII characters per token, one token per other character.
+        """
+        tokens = 0
+        for text in texts:
+            ascii_chars = sum(1 for char in text if ord(char) < 128)
+            tokens += ascii_chars // 4 + (len(text) - ascii_chars)
+        return tokens
+
+    def _complete(self, llm_prompt: str) -> str:
+        """
+        Send a prompt to the LLM, counting its tokens for the cache statistics.
+
+        Args:
+            llm_prompt: The complete prompt, page elements included
+
+        Returns:
+            str: The LLM response
+        """
+        self._sent_tokens += self._estimate_tokens(llm_prompt)
+        return self.llm_client.complete(llm_prompt)
 
     def _remove_empty_keys(self, dict_list: list) -> list:
         """
@@ -105,7 +173,8 @@ class AiFixtureBase:
             except (ValueError, TypeError):
                 raise ValueError(f"Cannot convert results to numbers: {result}")
 
-    def _get_cached_or_compute(self, prompt: str, context: dict, compute_func) -> Any:
+    def _get_cached_or_compute(self, prompt: str, context: dict, compute_func,
+                               operation: str = "action", format_hint: str = "", use_cache: bool = True) -> Any:
         """
         Get cached result or compute new result.
         
@@ -113,21 +182,134 @@ class AiFixtureBase:
             prompt: The prompt used for caching
             context: Context information for caching
             compute_func: Function to compute result if not cached
+            operation: Kind of request ('action', 'query', 'assert', 'function_cases')
+            format_hint: Requested result format, cached separately (e.g. 'string[]')
+            use_cache: False computes the result without reading or writing the cache
             
         Returns:
             Cached or computed result
         """
+        if not use_cache:
+            return compute_func()
+
         # Try to get from cache first
-        cached_response = self.cache_manager.get_intelligent(prompt, context)
-        if cached_response is not None:
-            return cached_response
+        cached_entry = self.cache_manager.get_intelligent_entry(prompt, context, operation, format_hint)
+        if cached_entry is not None:
+            return cached_entry.response
+
+        return self._compute_and_cache(prompt, context, compute_func, operation, format_hint)
+
+    def _execute_cached_or_compute(self, prompt: str, context: dict, compute_func, execute_func,
+                                   selection: Optional[ElementSelection] = None, locate_func=None) -> Any:
+        """
+        Execute an action instruction, taken from the cache when possible.
+        A cached instruction that fails to execute is evicted from the cache,
+        then a fresh instruction is computed and executed in its place.
+        A fresh instruction is cached once it executed successfully.
+
+        Args:
+            prompt: The prompt used for caching
+            context: Context information for caching
+            compute_func: Function to compute the instruction if not cached
+            execute_func: Function executing an instruction, called with the instruction
+                          and whether it comes from the cache
+            selection: The page elements compute_func sends to the LLM. While it can be
+                       widened, an invalid instruction (ValueError) or an instruction whose
+                       target locate_func doesn't find is computed again with more elements
+            locate_func: Function telling quickly whether the target of an instruction is on the page
+
+        Returns:
+            The result of execute_func
+        """
+        cached_entry = self.cache_manager.get_intelligent_entry(prompt, context)
+        if cached_entry is not None:
+            try:
+                return execute_func(cached_entry.response, True)
+            except Exception as e:
+                logger.warning(f"🩹 Cached instruction failed, recomputing: {prompt} ({e})")
+                self.cache_manager.invalidate(cached_entry.key)
+
+        while True:
+            can_widen = selection is not None and not selection.exhausted
+            try:
+                instruction, compute_time, compute_tokens = self._compute(prompt, context, compute_func)
+            except ValueError as e:
+                # Only invalid instructions are retried, LLM errors are not a matter of elements
+                if not can_widen:
+                    raise
+                selection.widen()
+                logger.warning(f"🔭 Invalid instruction on the most relevant elements, retrying with "
+                               f"{len(selection.elements)}: {prompt} ({e})")
+                continue
+            if can_widen and locate_func is not None and not locate_func(instruction):
+                selection.widen()
+                logger.warning(f"🔭 Instruction target not found, retrying with {len(selection.elements)} "
+                               f"elements: {prompt} ({instruction.get('selector')})")
+                continue
+
+            result = execute_func(instruction, False)
+            self._cache_result(prompt, context, instruction, compute_time, compute_tokens)
+            return result
 
-        # Compute new result
+    def _compute(self, prompt: str, context: dict, compute_func) -> Tuple[Any, float, int]:
+        """
+        Compute a result, measuring what it cost.
+
+        Args:
+            prompt: The prompt
+            context: Context information
+            compute_func: Function to compute the result
+
+        Returns:
+            Tuple[Any, float, int]: The result, the seconds and the estimated tokens it took
+        """
         try:
+            self._sent_tokens = 0
+            start_time = time.perf_counter()
             response = compute_func()
-            # Cache the result
-            self.cache_manager.set_intelligent(prompt, context, response)
-            return response
+            compute_time = time.perf_counter() - start_time
         except Exception as e:
             logger.error(f"❌ Computation function execution failed: {e}")
             raise
+        # The LLM saw the prompts sent with _complete() and produced the response
+        sent_tokens = self._sent_tokens or self._estimate_tokens(
+            prompt, json.dumps(context.get("elements", []), ensure_ascii=False))
+        compute_tokens = sent_tokens + self._estimate_tokens(json.dumps(response, ensure_ascii=False))
+        return response, compute_time, compute_tokens
+
+    def _cache_result(self, prompt: str, context: dict, response: Any, compute_time: float, compute_tokens: int,
+                      operation: str = "action", format_hint: str = "") -> None:
+        """
+        Store a computed result in the cache.
+
+        Args:
+            prompt: The prompt used for caching
+            context: Context information for caching
+            response: The computed result
+            compute_time: Seconds it took
+            compute_tokens: Estimated tokens it took
+            operation: Kind of request ('action', 'query', 'assert', 'function_cases')
+            format_hint: Requested result format
+        """
+        self.cache_manager.set_intelligent(prompt, context, response,
+                                           compute_time=compute_time, compute_tokens=compute_tokens,
+                                           operation=operation, format_hint=format_hint)
+
+    def _compute_and_cache(self, prompt: str, context: dict, compute_func,
+                           operation: str = "action", format_hint: str = "") -> Any:
+        """
+        Compute a result and store it in the cache.
+
+        Args:
+            prompt: The prompt used for caching
+            context: Context information for caching
+            compute_func: Function to compute the result
+            operation: Kind of request ('action', 'query', 'assert', 'function_cases')
+            format_hint: Requested result format
+
+        Returns:
+            The computed result
+        """
+        response, compute_time, compute_tokens = self._compute(prompt, context, compute_func)
+        self._cache_result(prompt, context, response, compute_time, compute_tokens, operation, format_hint)
+        return response
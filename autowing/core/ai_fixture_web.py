@@ -2,11 +2,234 @@
 Common base class for web automation fixtures that provides shared functionality
 for both Playwright and Selenium implementations.
 """
-from typing import Any, Dict
+import json
+import os
+from typing import Any, Dict, Optional
 from abc import ABC, abstractmethod
 
 from loguru import logger
 from autowing.core.ai_fixture_base import AiFixtureBase
+from autowing.core.element_ranker import ElementRanker, ElementSelection
+
+# 53-bit hash (cyrb53) of the visible page text, computed in the browser so the text is not transferred
+TEXT_HASH_FUNCTION = """
+function () {
+    const text = document.body ? document.body.innerText : '';
+    let h1 = 0xdeadbeef, h2 = 0x41c6ce57;
+    for (let i = 0; i < text.length; i++) {
+        const ch = text.charCodeAt(i);
+        h1 = Math.imul(h1 ^ ch, 2654435761);
+        h2 = Math.imul(h2 ^ ch, 1597334677);
+    }
+    h1 = Math.imul(h1 ^ (h1 >>> 16), 2246822507) ^ Math.imul(h2 ^ (h2 >>> 13), 3266489909);
+    h2 = Math.imul(h2 ^ (h2 >>> 16), 2246822507) ^ Math.imul(h1 ^ (h1 >>> 13), 3266489909);
+    return (4294967296 * (2097151 & h2) + (h1 >>> 0)).toString(16) + ':' + text.length;
+}
+"""
+
+# In-page change tracker: a MutationObserver plus input, scroll and navigation listeners
+# bump a version counter. Returns 'token:version:url', the token changes with every new
+# document, so an unchanged result means the page has not changed. Marker writes are ignored.
+CHANGE_TRACKER_FUNCTION = """
+function () {
+    let tracker = window.__autowingChangeTracker;
+    if (!tracker) {
+        tracker = {token: Math.random().toString(36).substr(2, 9), version: 0};
+        tracker.record = (records) => {
+            for (const record of records) {
+                if (record.type !== 'attributes' || record.attributeName !== 'data-autowing-id') {
+                    tracker.version++;
+                    return;
+                }
+            }
+        };
+        tracker.observer = new MutationObserver(tracker.record);
+        tracker.observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+        ['input', 'change', 'scroll', 'resize', 'hashchange', 'popstate'].forEach(type => {
+            window.addEventListener(type, () => { tracker.version++; }, {capture: true, passive: true});
+        });
+        window.__autowingChangeTracker = tracker;
+    }
+    // Count the mutations not delivered to the observer yet
+    tracker.record(tracker.observer.takeRecords());
+    return tracker.token + ':' + tracker.version + ':' + location.href;
+}
+"""
+
+# Visible interactive elements in a single deduplicated walk: one query for all selectors
+# (every element once, in document order), every rect read once before anything is
+# written, then the markers are injected. Empty fields are left out of the records.
+# With visibility {mode: 'filter' | 'rank', margin: px}, elements outside the viewport
+# (grown by margin) or covered at their centre by another element (hit test with
+# elementFromPoint) are dropped, or flagged 'offscreen' / 'occluded' and moved last.
+PAGE_ELEMENTS_FUNCTION = """
+function (injectMarkers, visibility) {
+    const markerSelector = [
+        'input:not([type="hidden"])',
+        'textarea',
+        'select',
+        'button',
+        'a[href]',
+        '[role="button"]',
+        '[role="link"]',
+        '[role="checkbox"]',
+        '[role="radio"]',
+        '[role="searchbox"]',
+        'summary',
+        '[contenteditable="true"]',
+        '[tabindex]:not([tabindex="-1"])'
+    ].join(',');
+    const elementSelector = [
+        'input',
+        'textarea',
+        'select',
+        'button',
+        'a',
+        '[role="button"]',
+        '[role="link"]',
+        '[role="checkbox"]',
+        '[role="radio"]',
+        '[role="searchbox"]',
+        'summary',
+        '[draggable="true"]'
+    ].join(',');
+    const box = (rect) => ({
+        x: Math.round(rect.x), y: Math.round(rect.y),
+        width: Math.round(rect.width), height: Math.round(rect.height)
+    });
+    const compact = (record) => {
+        for (const key of Object.keys(record)) {
+            if (record[key] === null || record[key] === undefined || record[key] === '') {
+                delete record[key];
+            }
+        }
+        return record;
+    };
+
+    // Read phase: layout is computed at most once, no write invalidates it in between
+    const candidates = document.querySelectorAll(markerSelector + ',' + elementSelector);
+    let visible = [];
+    for (let i = 0; i < candidates.length; i++) {
+        const rect = candidates[i].getBoundingClientRect();
+        if (rect.width > 0 && rect.height > 0) {
+            visible.push([candidates[i], rect, 0]);
+        }
+    }
+
+    const mode = visibility && visibility.mode;
+    if (mode === 'filter' || mode === 'rank') {
+        const margin = Math.max(0, Number(visibility.margin) || 0);
+        const width = window.innerWidth || document.documentElement.clientWidth;
+        const height = window.innerHeight || document.documentElement.clientHeight;
+        for (const entry of visible) {
+            const [el, rect] = entry;
+            if (rect.right < -margin || rect.bottom < -margin || rect.left > width + margin || rect.top > height + margin) {
+                entry[2] = 2;
+                continue;
+            }
+            // Hit test the centre of the part inside the viewport, if any
+            const left = Math.max(rect.left, 0), right = Math.min(rect.right, width);
+            const top = Math.max(rect.top, 0), bottom = Math.min(rect.bottom, height);
+            if (left < right && top < bottom) {
+                const hit = document.elementFromPoint((left + right) / 2, (top + bottom) / 2);
+                if (hit && hit !== el && !el.contains(hit)) {
+                    entry[2] = 1;
+                }
+            }
+        }
+        if (mode === 'filter') {
+            visible = visible.filter(entry => entry[2] === 0);
+        } else {
+            // Stable: document order within each rank
+            visible.sort((a, b) => a[2] - b[2]);
+        }
+    }
+
+    // Write phase: mark the new interactive elements
+    const markers = [];
+    if (injectMarkers) {
+        for (const [el, rect] of visible) {
+            if (el.hasAttribute('data-autowing-id') || !el.matches(markerSelector)) {
+                continue;
+            }
+            const uniqueId = 'aw-' + Math.random().toString(36).substr(2, 9);
+            el.setAttribute('data-autowing-id', uniqueId);
+            markers.push({
+                id: uniqueId,
+                tagName: el.tagName.toLowerCase(),
+                type: el.getAttribute('type') || null,
+                placeholder: el.getAttribute('placeholder') || null,
+                value: el.value || null,
+                textContent: el.textContent ? el.textContent.trim().substring(0, 100) : '',
+                ariaLabel: el.getAttribute('aria-label') || null,
+                role: el.getAttribute('role') || null,
+                boundingBox: box(rect)
+            });
+        }
+    }
+
+    const elements = [];
+    for (const [el, rect, rank] of visible) {
+        if (!el.matches(elementSelector)) {
+            continue;
+        }
+        elements.push(compact({
+            tag: el.tagName.toLowerCase(),
+            type: el.getAttribute('type'),
+            placeholder: el.getAttribute('placeholder'),
+            value: el.value,
+            text: el.textContent ? el.textContent.replace(/\\s+/g, ' ').trim() : '',
+            aria: el.getAttribute('aria-label'),
+            id: el.id,
+            name: el.getAttribute('name'),
+            class: el.getAttribute('class'),
+            draggable: el.getAttribute('draggable'),
+            autowingId: el.getAttribute('data-autowing-id'),
+            boundingBox: box(rect),
+            offscreen: rank === 2 ? true : null,
+            occluded: rank === 1 ? true : null
+        }));
+    }
+    return {markers: markers, elements: elements};
+}
+"""
+
+# Page snapshot in a single call: injects the element markers, collects the URL, title,
+# visible interactive elements and optionally the text hash, and returns them as one
+# JSON string so the driver doesn't marshal thousands of nested objects.
+PAGE_SNAPSHOT_FUNCTION = """
+function (options) {
+    options = options || {};
+    let version = null;
+    try {
+        // Taken before reading the page, changes made meanwhile show up as a new version
+        version = (__CHANGE_TRACKER_FUNCTION__)();
+    } catch (e) {
+        version = null;
+    }
+    const found = (__PAGE_ELEMENTS_FUNCTION__)(!!options.injectMarkers, options.visibility);
+
+    let textHash = null;
+    if (options.textHash) {
+        try {
+            textHash = (__TEXT_HASH_FUNCTION__)();
+        } catch (e) {
+            textHash = null;
+        }
+    }
+
+    return JSON.stringify({
+        url: location.href,
+        title: document.title,
+        markers: found.markers,
+        elements: found.elements,
+        textHash: textHash,
+        version: version
+    });
+}
+""".replace("__PAGE_ELEMENTS_FUNCTION__", PAGE_ELEMENTS_FUNCTION.strip()).replace(
+    "__TEXT_HASH_FUNCTION__", TEXT_HASH_FUNCTION.strip()).replace(
+    "__CHANGE_TRACKER_FUNCTION__", CHANGE_TRACKER_FUNCTION.strip())
 
 
 class AiFixtureWeb(AiFixtureBase, ABC):
@@ -20,6 +243,51 @@ class AiFixtureWeb(AiFixtureBase, ABC):
         super().__init__()
         self._element_markers = {}  # Store element marker mappings
         self._inject_markers_enabled = True  # Control whether to enable marker injection
+        self._viewport_filter = None  # Filter or rank elements by viewport and occlusion, see set_viewport_filter
+        # Capture the page context in a single script call, falls back to separate calls if it fails
+        self.page_snapshot_enabled = True
+        self._snapshot_failures = 0
+        # Reuse the last page context while the in-page change tracker reports no change
+        self.context_reuse_enabled = True
+        self._last_page_context = None
+        self._last_page_version = None
+        # Seconds to wait for the element of a cached instruction before recomputing it
+        self.cached_instruction_timeout = 0.5
+        # Actions send the element_top_k elements most relevant to the prompt, 0 sends them all,
+        # and up to element_widen_rounds times more when the instruction is invalid or its target missing
+        self.element_ranker = ElementRanker()
+        self.element_top_k = int(os.getenv("AUTOWING_ELEMENT_TOP_K", "50"))
+        self.element_widen_rounds = 2
+
+    def _select_elements(self, prompt: str, elements: list) -> ElementSelection:
+        """
+        Select the page elements to send to the LLM for a prompt.
+
+        Args:
+            prompt (str): The prompt
+            elements (list): All elements of the page context
+
+        Returns:
+            ElementSelection: The element_top_k most relevant elements and the anchors,
+                              widened when the instruction fails
+        """
+        return ElementSelection(self.element_ranker, prompt, elements, self.element_top_k,
+                                max_widenings=self.element_widen_rounds)
+
+    @abstractmethod
+    def _instruction_target_exists(self, instruction: dict) -> bool:
+        """
+        Check whether the target element of an instruction is on the page,
+        waiting at most cached_instruction_timeout.
+        Must be implemented by subclasses.
+
+        Args:
+            instruction (dict): The instruction with its 'selector'
+
+        Returns:
+            bool: True if an element matches the selector
+        """
+        pass
 
     def _inject_element_markers(self) -> None:
         """
@@ -31,24 +299,31 @@ class AiFixtureWeb(AiFixtureBase, ABC):
             
         try:
             markers = self._execute_marker_injection_script()
-            
-            # Always ensure we have a list
-            if not isinstance(markers, list):
-                markers = []
-            
-            # Update marker mapping
-            for marker in markers:
-                if isinstance(marker, dict) and 'id' in marker:
-                    self._element_markers[marker['id']] = marker
-                
-            logger.debug(f"💉 Injected {len(markers)} element markers")
-            
+            self._update_element_markers(markers)
         except Exception as e:
             logger.warning(f"⚠️ Element marker injection failed: {str(e)}")
             # Ensure we have an empty dict even on failure
             if not hasattr(self, '_element_markers'):
                 self._element_markers = {}
 
+    def _update_element_markers(self, markers: Any) -> None:
+        """
+        Record newly injected element markers.
+
+        Args:
+            markers (Any): The markers returned by the injection script
+        """
+        # Always ensure we have a list
+        if not isinstance(markers, list):
+            markers = []
+
+        # Update marker mapping
+        for marker in markers:
+            if isinstance(marker, dict) and 'id' in marker:
+                self._element_markers[marker['id']] = marker
+
+        logger.debug(f"💉 Injected {len(markers)} element markers")
+
     @abstractmethod
     def _execute_marker_injection_script(self) -> Any:
         """
@@ -96,15 +371,122 @@ class AiFixtureWeb(AiFixtureBase, ABC):
         """
         pass
 
-    def _get_page_context(self) -> Dict[str, Any]:
+    @abstractmethod
+    def _execute_snapshot_script(self, options: Dict[str, Any]) -> Any:
+        """
+        Execute PAGE_SNAPSHOT_FUNCTION with its options.
+        Must be implemented by subclasses.
+
+        Args:
+            options (Dict[str, Any]): 'injectMarkers' and 'textHash' flags, 'visibility' options
+
+        Returns:
+            Any: The JSON string returned by the script
+        """
+        pass
+
+    @abstractmethod
+    def _execute_change_tracker_script(self) -> Any:
+        """
+        Execute CHANGE_TRACKER_FUNCTION.
+        Must be implemented by subclasses.
+
+        Returns:
+            Any: The page version string returned by the script
+        """
+        pass
+
+    def _reuse_page_context(self, text_hash: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Get the last captured page context if the page has not changed since.
+
+        Args:
+            text_hash (bool): The context must include the text hash
+
+        Returns:
+            Optional[Dict[str, Any]]: A copy of the last context, None if it must be captured again
+        """
+        cached = self._last_page_context
+        if not self.context_reuse_enabled or cached is None or self._last_page_version is None:
+            return None
+        if text_hash and "textHash" not in cached:
+            return None
+        try:
+            version = self._execute_change_tracker_script()
+        except Exception as e:
+            logger.debug(f"Page change tracking failed: {str(e)}")
+            return None
+        if version != self._last_page_version:
+            return None
+
+        logger.debug("♻️ Page unchanged, reusing its context")
+        return dict(cached)
+
+    def _forget_page_context(self) -> None:
+        """Capture the page context again on the next call"""
+        self._last_page_context = None
+        self._last_page_version = None
+
+    def _capture_page_snapshot(self, text_hash: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Capture the page context with a single script call.
+
+        Args:
+            text_hash (bool): Also hash the visible page text
+
+        Returns:
+            Optional[Dict[str, Any]]: The page context, None if the snapshot failed
+        """
+        try:
+            snapshot = self._execute_snapshot_script({
+                "injectMarkers": self._inject_markers_enabled,
+                "textHash": text_hash,
+                "visibility": self._viewport_filter
+            })
+            snapshot = json.loads(snapshot) if isinstance(snapshot, str) else snapshot
+            if not isinstance(snapshot, dict):
+                raise ValueError(f"Unexpected page snapshot: {str(snapshot)[:100]}")
+        except Exception as e:
+            logger.warning(f"⚠️ Page snapshot failed, capturing the page context in separate calls: {str(e)}")
+            # A navigation can interrupt a single snapshot, only give up when it keeps failing
+            self._snapshot_failures += 1
+            if self._snapshot_failures >= 3:
+                self.page_snapshot_enabled = False
+            return None
+
+        self._snapshot_failures = 0
+
+        if self._inject_markers_enabled:
+            self._update_element_markers(snapshot.get("markers"))
+        context = {
+            "url": snapshot.get("url", ""),
+            "title": snapshot.get("title", ""),
+            "elements": snapshot.get("elements") or [],
+            "elementMarkers": self._element_markers
+        }
+        if text_hash and snapshot.get("textHash"):
+            context["textHash"] = snapshot["textHash"]
+        self._last_page_context = dict(context)
+        self._last_page_version = snapshot.get("version")
+        return context
+
+    def _get_page_context(self, text_hash: bool = False) -> Dict[str, Any]:
         """
         Extract context information from the current page.
         Collects information about visible elements and page metadata.
 
+        Args:
+            text_hash (bool): Also add a 'textHash' entry, when the page snapshot provides it
+
         Returns:
             Dict[str, Any]: A dictionary containing page URL, title, and information about
                            visible interactive elements
         """
+        if self.page_snapshot_enabled:
+            context = self._reuse_page_context(text_hash) or self._capture_page_snapshot(text_hash)
+            if context is not None:
+                return context
+
         # Inject element markers
         self._inject_element_markers()
         
@@ -124,6 +506,38 @@ class AiFixtureWeb(AiFixtureBase, ABC):
             "elementMarkers": self._element_markers  # Add marker information
         }
 
+    @abstractmethod
+    def _execute_text_hash_script(self) -> Any:
+        """
+        Execute JavaScript to hash the visible text of the page.
+        Must be implemented by subclasses.
+
+        Returns:
+            Any: The hash computed in the browser
+        """
+        pass
+
+    def _get_content_context(self) -> Dict[str, Any]:
+        """
+        Page context of operations that read the page content (queries, assertions).
+        Adds a hash of the visible page text, so cached results are reused only
+        while the text they were computed from is unchanged.
+
+        Returns:
+            Dict[str, Any]: The page context with a 'textHash' entry. 'textHash' is None if
+                            the text could not be hashed: cached results could then be stale,
+                            callers skip the cache
+        """
+        context = self._get_page_context(text_hash=True)
+        if context.get("textHash"):
+            return context
+        try:
+            context["textHash"] = self._execute_text_hash_script() or None
+        except Exception as e:
+            logger.warning(f"⚠️ Page text hashing failed, not using the cache: {str(e)}")
+            context["textHash"] = None
+        return context
+
     def enable_marker_injection(self, enabled: bool = True):
         """
         Enable or disable element marker injection feature
@@ -132,9 +546,33 @@ class AiFixtureWeb(AiFixtureBase, ABC):
             enabled (bool): Whether to enable marker injection
         """
         self._inject_markers_enabled = enabled
+        self._forget_page_context()
         if not enabled:
             self._clear_element_markers()
 
+    def set_viewport_filter(self, mode: Optional[str] = "filter", margin: int = 200):
+        """
+        Filter or rank the page elements by viewport intersection and occlusion.
+        An element is visible if its rect intersects the viewport grown by margin
+        pixels on every side, and no other element covers the centre of its part
+        inside the viewport (hit test with elementFromPoint).
+
+        Args:
+            mode (Optional[str]): 'filter' drops the elements that are not visible,
+                                  'rank' keeps them last, flagged 'offscreen' or 'occluded',
+                                  None keeps every element with a size, in document order
+            margin (int): Pixels around the viewport still considered visible
+
+        Raises:
+            ValueError: If the mode is unknown or the margin is negative
+        """
+        if mode not in (None, "filter", "rank"):
+            raise ValueError(f"Unknown viewport filter mode: {mode}")
+        if margin < 0:
+            raise ValueError(f"Viewport margin must not be negative: {margin}")
+        self._viewport_filter = {"mode": mode, "margin": margin} if mode else None
+        self._forget_page_context()
+
     @abstractmethod
     def _clear_element_markers_script(self) -> str:
         """
@@ -152,6 +590,7 @@ class AiFixtureWeb(AiFixtureBase, ABC):
             clear_script = self._clear_element_markers_script()
             self._execute_javascript(clear_script)
             self._element_markers.clear()
+            self._forget_page_context()
             logger.debug("🧹 Cleared all element markers")
         except Exception as e:
             logger.warning(f"⚠️ Failed to clear element markers: {str(e)}")
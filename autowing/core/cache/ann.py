@@ -0,0 +1,205 @@
+"""
+Approximate nearest neighbour index for very large prompt caches.
+
+Prompts are represented by the set of their n-grams and summarized by a MinHash
+signature. Locality sensitive hashing splits every signature into ``bands`` of
+``rows`` values; prompts sharing any whole band are candidates. Two prompts with
+n-gram Jaccard similarity ``s`` become candidates with probability
+``1 - (1 - s ** rows) ** bands``: more bands or fewer rows raise the recall,
+at the cost of more candidates to rerank.
+"""
+import os
+import random
+import struct
+import tempfile
+import zlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, signatures are then computed in pure Python
+    np = None
+
+_SIGNATURE_FILE_MAGIC = b'AWMH1\n'
+# Mersenne prime 2^31 - 1: a * x + b stays below 2^63 for 32-bit x
+_PRIME = (1 << 31) - 1
+
+
+class MinHashLSH:
+    """
+    MinHash LSH index of n-gram sets, addressed by cache key.
+    """
+
+    def __init__(self, bands: int = 32, rows: int = 4, seed: int = 1):
+        """
+        Initialize an empty index.
+
+        Args:
+            bands: Number of bands, more bands find more (and less similar) candidates
+            rows: Signature values per band, more rows make candidates more similar
+            seed: Seed of the hash permutations, signatures are only comparable with the same seed
+        """
+        self.bands = bands
+        self.rows = rows
+        self.seed = seed
+        self.num_perm = bands * rows
+        generator = random.Random(seed)
+        self._a = [generator.randrange(1, _PRIME) for _ in range(self.num_perm)]
+        self._b = [generator.randrange(0, _PRIME) for _ in range(self.num_perm)]
+        if np is not None:
+            self._np_a = np.array(self._a, dtype=np.uint64)[:, None]
+            self._np_b = np.array(self._b, dtype=np.uint64)[:, None]
+        # key -> signature
+        self._signatures: Dict[str, List[int]] = {}
+        # one table per band: band values -> keys
+        self._tables = [defaultdict(set) for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._signatures
+
+    def signature(self, features: Iterable[str]) -> List[int]:
+        """
+        MinHash signature of a set of features (n-grams).
+
+        Args:
+            features: The features, duplicates are ignored
+
+        Returns:
+            List[int]: num_perm minimum hash values
+        """
+        hashes = {zlib.crc32(feature.encode('utf-8')) for feature in features}
+        if not hashes:
+            return [_PRIME] * self.num_perm
+        if np is not None:
+            values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))[None, :]
+            return ((self._np_a * values + self._np_b) % _PRIME).min(axis=1).tolist()
+        return [min((a * x + b) % _PRIME for x in hashes) for a, b in zip(self._a, self._b)]
+
+    def _bands(self, signature: List[int]):
+        for band in range(self.bands):
+            yield band, tuple(signature[band * self.rows:(band + 1) * self.rows])
+
+    def add(self, key: str, signature: List[int]) -> None:
+        """
+        Index a signature.
+
+        Args:
+            key: Cache key of the entry
+            signature: Its MinHash signature
+        """
+        if key in self._signatures:
+            self.remove(key)
+        self._signatures[key] = signature
+        for band, values in self._bands(signature):
+            self._tables[band][values].add(key)
+
+    def remove(self, key: str) -> None:
+        """
+        Remove a key from the index, if present.
+
+        Args:
+            key: Cache key of the entry
+        """
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for band, values in self._bands(signature):
+            keys = self._tables[band].get(values)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tables[band][values]
+
+    def clear(self) -> None:
+        """Remove all keys"""
+        self._signatures.clear()
+        self._tables = [defaultdict(set) for _ in range(self.bands)]
+
+    def query(self, signature: List[int]) -> Set[str]:
+        """
+        Keys sharing at least one band with a signature.
+
+        Args:
+            signature: MinHash signature of the query
+
+        Returns:
+            Set[str]: Candidate keys, to be reranked by exact similarity
+        """
+        candidates = set()
+        for band, values in self._bands(signature):
+            keys = self._tables[band].get(values)
+            if keys:
+                candidates.update(keys)
+        return candidates
+
+    def save(self, path: str, extra: Optional[Dict[str, List[int]]] = None) -> int:
+        """
+        Persist the signatures, atomically replacing the file.
+
+        Args:
+            path: File to write
+            extra: More signatures to persist, e.g. loaded from the file but not indexed
+
+        Returns:
+            int: Number of saved signatures
+        """
+        signatures = dict(extra or {})
+        signatures.update(self._signatures)
+        header = f"{self.bands} {self.rows} {self.seed}\n".encode()
+        row = struct.Struct(f">{self.num_perm}I")
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_SIGNATURE_FILE_MAGIC + header)
+                for key, signature in signatures.items():
+                    encoded_key = key.encode('utf-8')
+                    f.write(struct.pack('>H', len(encoded_key)) + encoded_key + row.pack(*signature))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return len(signatures)
+
+    def load_signatures(self, path: str) -> Dict[str, List[int]]:
+        """
+        Read signatures saved with the same parameters.
+
+        Args:
+            path: File written by save()
+
+        Returns:
+            Dict[str, List[int]]: key -> signature, empty if the file is missing,
+            invalid or was written with other parameters
+        """
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return {}
+        if not data.startswith(_SIGNATURE_FILE_MAGIC):
+            return {}
+        header_end = data.find(b'\n', len(_SIGNATURE_FILE_MAGIC))
+        if data[len(_SIGNATURE_FILE_MAGIC):header_end] != f"{self.bands} {self.rows} {self.seed}".encode():
+            return {}
+
+        row = struct.Struct(f">{self.num_perm}I")
+        signatures = {}
+        offset = header_end + 1
+        try:
+            while offset < len(data):
+                (key_length,) = struct.unpack_from('>H', data, offset)
+                offset += 2
+                key = data[offset:offset + key_length].decode('utf-8')
+                offset += key_length
+                signatures[key] = list(row.unpack_from(data, offset))
+                offset += row.size
+        except (struct.error, UnicodeDecodeError):
+            # Truncated file, keep what was read
+            pass
+        return signatures
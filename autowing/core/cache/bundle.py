@@ -0,0 +1,140 @@
+"""
+Cache bundles: a whole cache, or part of it, in a single compressed file that can
+be shipped as a CI artifact and imported into another cache directory.
+
+A bundle is a gzip compressed JSON lines file. The first line is a header::
+
+    {"format": "autowing-cache-bundle", "version": 1, "created": "...", "entries": 42, ...}
+
+every following line is a storage record (see ``storage``).
+"""
+import fnmatch
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from autowing.core.cache.partition import record_url
+
+BUNDLE_FORMAT = "autowing-cache-bundle"
+BUNDLE_VERSION = 1
+
+
+def filter_records(records: Iterable[Dict[str, Any]], url_pattern: Optional[str] = None,
+                   max_age_days: Optional[float] = None,
+                   min_usage: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Select records to bundle.
+
+    Args:
+        records: The records to filter
+        url_pattern: Keep records cached on a page matching this shell-style pattern,
+                     e.g. 'https://example.com/admin/*'
+        max_age_days: Keep records created in the last max_age_days days
+        min_usage: Keep records used at least min_usage times
+
+    Returns:
+        Iterator[Dict[str, Any]]: The selected records
+    """
+    cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat() if max_age_days is not None else None
+    for record in records:
+        if url_pattern is not None and not fnmatch.fnmatchcase(record_url(record), url_pattern):
+            continue
+        if cutoff is not None and record['timestamp'] < cutoff:
+            continue
+        if min_usage is not None and record.get('usage_count', 1) < min_usage:
+            continue
+        yield record
+
+
+def write_bundle(path: str, records: Iterable[Dict[str, Any]], **header: Any) -> int:
+    """
+    Write records into a bundle file, atomically replacing it.
+
+    Args:
+        path: The bundle file
+        records: The records to write
+        **header: Extra header fields, e.g. the filters used
+
+    Returns:
+        int: Number of written records
+    """
+    records = list(records)
+    header = {"format": BUNDLE_FORMAT, "version": BUNDLE_VERSION,
+              "created": datetime.now().isoformat(), "entries": len(records), **header}
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+    os.close(fd)
+    try:
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps(header, ensure_ascii=False) + '\n')
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return len(records)
+
+
+def read_bundle_header(path: str) -> Dict[str, Any]:
+    """
+    Read the header of a bundle file.
+
+    Args:
+        path: The bundle file
+
+    Returns:
+        Dict[str, Any]: The header
+
+    Raises:
+        ValueError: If the file is not a bundle or has an unsupported version
+    """
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            line = f.readline()
+    except (gzip.BadGzipFile, EOFError, UnicodeDecodeError):
+        line = ''
+    return _parse_header(path, line)
+
+
+def read_bundle(path: str) -> Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]:
+    """
+    Read a bundle file.
+
+    Args:
+        path: The bundle file
+
+    Returns:
+        Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]: The header and the records
+
+    Raises:
+        ValueError: If the file is not a bundle or has an unsupported version
+    """
+    header = read_bundle_header(path)
+
+    def records() -> Iterator[Dict[str, Any]]:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            f.readline()
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    return header, records()
+
+
+def _parse_header(path: str, line: str) -> Dict[str, Any]:
+    try:
+        header = json.loads(line)
+    except ValueError:
+        header = None
+    if not isinstance(header, dict) or header.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"Not an auto-wing cache bundle: {path}")
+    if header.get("version", 0) > BUNDLE_VERSION:
+        raise ValueError(f"Unsupported cache bundle version {header.get('version')}: {path}")
+    return header
@@ -1,14 +1,38 @@
+import atexit
 import hashlib
 import json
 import os
+import re
 import math
+import threading
+import time
+import weakref
+import zlib
 from datetime import datetime, timedelta
-from typing import Any, Optional, List, Dict
-from dataclasses import dataclass
-from collections import defaultdict, Counter
+from typing import Any, Optional, List, Dict, Union, Iterable, Callable
+from dataclasses import dataclass, field
+from collections import defaultdict, Counter, OrderedDict
 
 from loguru import logger
 
+from autowing.core.cache.ann import MinHashLSH
+from autowing.core.cache.fingerprint import StructuralFingerprint, jaccard
+from autowing.core.cache.locking import FileLock
+from autowing.core.cache.partition import UrlNormalizer, record_url
+from autowing.core.cache.statistics import CacheStatistics
+from autowing.core.cache.bundle import filter_records, read_bundle, write_bundle
+from autowing.core.cache.remote import RemoteCache, RemoteStorage, create_remote_cache
+from autowing.core.cache.storage import (CacheStorage, JsonDirStorage, MemoryStorage, ReadOnlyStorage,
+                                         SQLiteStorage, TieredStorage, WriteBehindStorage, copy_records,
+                                         record_size)
+from autowing.core.cache.vector_index import VectorIndex
+
+# Single Chinese characters, or English words (letters and digits, with apostrophes inside)
+_TOKEN_PATTERN = re.compile(r"[\u4e00-\u9fff]|[^\W_](?:[^\W_]|')*")
+_CHINESE_PATTERN = re.compile(r"[\u4e00-\u9fff]")
+# Common Chinese stop words, deleted before tokenizing
+_STOP_WORD_TABLE = str.maketrans('', '', '的了在是我有和就不人都一')
+
 
 @dataclass
 class CacheEntry:
@@ -20,10 +44,35 @@ class CacheEntry:
     timestamp: datetime
     similarity_score: float = 0.0
     usage_count: int = 1
+    last_accessed: Optional[datetime] = None
+    # LLM seconds and estimated tokens it took to compute the response
+    compute_time: float = 0.0
+    compute_tokens: int = 0
+    # Normalized address of the page it was recorded on
+    partition: str = ''
+
+
+@dataclass
+class ContextBucket:
+    """Cache entries recorded against the same context hash, with their prompt vectors"""
+    entries: List[CacheEntry] = field(default_factory=list)
+    index: VectorIndex = field(default_factory=VectorIndex)
+    # cache key -> row of the entry in entries and index
+    positions: Dict[str, int] = field(default_factory=dict)
+
+    def append(self, entry: CacheEntry, vector: List[float]) -> None:
+        """Add an entry and its prompt vector"""
+        self.positions[entry.key] = self.index.add(vector)
+        self.entries.append(entry)
 
 
 class ImprovedTFIDFVectorizer:
     """Improved TF-IDF vectorizer for better semantic matching"""
+
+    # The vocabulary is fitted over the whole corpus, adding a text means refitting
+    incremental = False
+    # Number of texts whose n-grams are memoized
+    ngram_cache_size = 4096
     
     def __init__(self, ngram_range=(1, 2), max_features=500):
         self.ngram_range = ngram_range
@@ -32,55 +81,58 @@ class ImprovedTFIDFVectorizer:
         self.idf_ = {}
         self.vocab_size = 0
         self.doc_freq_ = defaultdict(int)
+        # text -> n-grams, least recently used first
+        self._ngram_cache: OrderedDict = OrderedDict()
         
     def _preprocess_text(self, text: str) -> str:
         """Text preprocessing"""
-        # Convert to lowercase and remove common stop word patterns
-        text = text.lower()
-        # Simple stop word handling
-        stop_patterns = ['的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '一个']
-        for pattern in stop_patterns:
-            text = text.replace(pattern, '')
-        return text.strip()
-    
+        # Convert to lowercase and remove common stop words in a single pass
+        return text.lower().translate(_STOP_WORD_TABLE).strip()
+
+    def _tokenize(self, text: str) -> List[str]:
+        """Split text into tokens: single Chinese characters and English words"""
+        return _TOKEN_PATTERN.findall(self._preprocess_text(text))
+
+    @staticmethod
+    def _ngrams(tokens: List[str], chinese: List[bool], n: int) -> List[str]:
+        """N-grams of tokens, joined without separator when they contain Chinese, with spaces otherwise"""
+        if n == 1:
+            return list(tokens)
+        return [''.join(tokens[i:i + n]) if any(chinese[i:i + n]) else ' '.join(tokens[i:i + n])
+                for i in range(len(tokens) - n + 1)]
+
     def _generate_ngrams(self, text: str, n: int) -> List[str]:
         """Generate n-grams, supporting both Chinese and English"""
-        # Preprocess text
-        processed_text = self._preprocess_text(text)
-        
-        # Handle mixed Chinese and English text
-        tokens = []
-        i = 0
-        while i < len(processed_text):
-            # Check if it's a Chinese character
-            if '\u4e00' <= processed_text[i] <= '\u9fff':
-                tokens.append(processed_text[i])
-                i += 1
-            else:
-                # English word processing
-                if processed_text[i].isalnum():
-                    word_start = i
-                    while i < len(processed_text) and (processed_text[i].isalnum() or processed_text[i] == "'"):
-                        i += 1
-                    if i > word_start:
-                        tokens.append(processed_text[word_start:i])
-                else:
-                    i += 1
-        
-        # Generate n-grams
+        tokens = self._tokenize(text)
+        return self._ngrams(tokens, [_CHINESE_PATTERN.search(token) is not None for token in tokens], n)
+
+    def _text_ngrams(self, text: str) -> tuple:
+        """
+        All n-grams of a text for every n of ngram_range, tokenizing it once.
+        Memoized per vectorizer, repeated prompts are never tokenized again.
+        """
+        features = self._ngram_cache.get(text)
+        if features is not None:
+            self._ngram_cache.move_to_end(text)
+            return features
+
+        tokens = self._tokenize(text)
+        chinese = [_CHINESE_PATTERN.search(token) is not None for token in tokens]
         ngrams = []
-        for i in range(len(tokens) - n + 1):
-            ngram = ''.join(tokens[i:i + n]) if any('\u4e00' <= c <= '\u9fff' for c in ''.join(tokens[i:i + n])) else ' '.join(tokens[i:i + n])
-            if ngram.strip():
-                ngrams.append(ngram)
-        return ngrams
-    
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            ngrams.extend(self._ngrams(tokens, chinese, n))
+        features = tuple(ngrams)
+
+        self._ngram_cache[text] = features
+        if len(self._ngram_cache) > self.ngram_cache_size:
+            self._ngram_cache.popitem(last=False)
+        return features
+
     def _get_all_ngrams(self, texts: List[str]) -> List[str]:
         """Get all n-grams from texts"""
         all_ngrams = []
         for text in texts:
-            for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
-                all_ngrams.extend(self._generate_ngrams(text, n))
+            all_ngrams.extend(self._text_ngrams(text))
         return all_ngrams
     
     def fit_transform(self, texts: List[str]):
@@ -93,9 +145,7 @@ class ImprovedTFIDFVectorizer:
         all_ngrams_list = []
         
         for text in texts:
-            text_ngrams = []
-            for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
-                text_ngrams.extend(self._generate_ngrams(text, n))
+            text_ngrams = self._text_ngrams(text)
             all_ngrams_list.append(text_ngrams)
             
             # Count how many documents each n-gram appears in
@@ -129,9 +179,7 @@ class ImprovedTFIDFVectorizer:
             vector = [0.0] * self.vocab_size
             
             # Generate all n-grams for current text
-            text_ngrams = []
-            for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
-                text_ngrams.extend(self._generate_ngrams(text, n))
+            text_ngrams = self._text_ngrams(text)
             
             if not text_ngrams:
                 vectors.append(vector)
@@ -154,14 +202,70 @@ class ImprovedTFIDFVectorizer:
         return vectors
 
 
+class HashingVectorizer(ImprovedTFIDFVectorizer):
+    """
+    Stateless hashing-trick vectorizer.
+
+    N-grams are mapped into a fixed feature space with a stable hash, so no
+    vocabulary has to be fitted and vectors produced at different times stay
+    comparable. New cache entries only need to vectorize their own prompt.
+    """
+
+    incremental = True
+
+    def __init__(self, ngram_range=(1, 2), n_features=1024):
+        super().__init__(ngram_range=ngram_range, max_features=n_features)
+        self.n_features = n_features
+        self.vocab_size = n_features
+
+    def _feature_index(self, ngram: str) -> int:
+        """Map an n-gram to a feature index (stable across processes)"""
+        return zlib.crc32(ngram.encode('utf-8')) % self.n_features
+
+    def fit_transform(self, texts: List[str]):
+        """Nothing to fit, identical to transform"""
+        return self.transform(texts)
+
+    def transform(self, texts: List[str]):
+        """Transform texts to L2-normalized hashed TF vectors"""
+        vectors = []
+        for text in texts:
+            vector = [0.0] * self.n_features
+
+            for ngram, count in Counter(self._text_ngrams(text)).items():
+                # Use logarithmic TF scaling, collisions simply add up
+                vector[self._feature_index(ngram)] += 1 + math.log(count)
+
+            norm = math.sqrt(sum(v * v for v in vector))
+            if norm > 0:
+                vector = [v / norm for v in vector]
+            vectors.append(vector)
+
+        return vectors
+
+
 class IntelligentCacheManager:
     """
     Intelligent cache manager that uses semantic similarity to find cache hits
     even when exact matches don't exist.
     """
 
+    # Number of entries with unsaved access metadata that triggers a flush
+    usage_flush_threshold = 32
+
     def __init__(self, cache_dir: str = ".auto-wing/cache", ttl_days: int = 7, 
-                 similarity_threshold: float = 0.7):
+                 similarity_threshold: float = 0.7, vectorizer: str = "hashing",
+                 storage: Union[str, CacheStorage, None] = None, preload: bool = False,
+                 shared: Optional[bool] = None, sync_interval: float = 1.0,
+                 max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 eviction_policy: str = "lru", entry_format: str = "compact",
+                 compression: Optional[str] = None, ann: Union[str, MinHashLSH, None] = None,
+                 ann_min_entries: int = 1000, context_mode: str = "exact",
+                 structure_threshold: float = 0.9, volatile_fields: Optional[Iterable[str]] = None,
+                 read_only: Optional[bool] = None, write_behind: Optional[bool] = None,
+                 flush_interval: float = 0.5, write_queue_size: int = 1000,
+                 remote: Union[str, RemoteCache, None] = None,
+                 url_normalizer: Optional[Callable[[str], str]] = None):
         """
         Initialize the intelligent cache manager.
         
@@ -169,57 +273,444 @@ class IntelligentCacheManager:
             cache_dir: Directory to store cache files
             ttl_days: Number of days to keep cache entries
             similarity_threshold: Minimum similarity score for cache hit (0.0-1.0)
+            vectorizer: Prompt vectorizer, 'hashing' (stateless, incremental) or 'tfidf'
+                        (refits the vocabulary over all prompts on every change)
+            storage: Storage backend, 'sqlite' (single indexed file), 'json' (one file per entry)
+                     or a CacheStorage instance. Defaults to env AUTOWING_CACHE_STORAGE or 'sqlite'
+            preload: Load the whole cache in a background thread right away. Otherwise
+                     nothing is read until the first lookup, which only loads what it needs
+            shared: The cache directory is shared with other processes (e.g. pytest-xdist workers),
+                    entries they write are picked up on cache misses. Defaults to True under xdist
+            sync_interval: Minimum seconds between two pickups of other processes' entries
+            max_entries: Maximum number of stored entries, None for no limit
+            max_bytes: Maximum total size of stored entries in bytes, None for no limit
+            eviction_policy: Entries to drop first when a limit is exceeded, 'lru' (least recently
+                             used) or 'lfu' (least frequently used)
+            entry_format: 'compact' stores the context hash plus a small page and target element
+                          fingerprint, 'full' also stores the whole page context
+            compression: Compress stored entries with 'gzip' or 'zstd', SQLite storage only.
+                         Defaults to env AUTOWING_CACHE_COMPRESSION or no compression
+            ann: Approximate nearest neighbour index for semantic lookups in large contexts,
+                 'minhash' or a configured MinHashLSH instance (bands and rows tune the recall).
+                 Its signatures are persisted next to the cache store. None searches exhaustively
+            ann_min_entries: Contexts with fewer entries are still searched exhaustively
+            context_mode: 'exact' matches entries recorded on exactly the same page context,
+                          'structural' ignores volatile fields, numbers, dates and times, and lets
+                          actions reuse entries of a page whose element set is similar enough
+            structure_threshold: Minimum Jaccard similarity of element sets in structural mode
+            volatile_fields: Element fields ignored in structural mode,
+                             defaults to value, autowingId and boundingBox
+            read_only: Never write to the cache directory, new entries and imported bundles
+                       are only kept in memory. Defaults to env AUTOWING_CACHE_READ_ONLY
+            write_behind: Store entries from a background thread, in batches, instead of waiting
+                          for the write. Defaults to env AUTOWING_CACHE_WRITE_BEHIND
+            flush_interval: Write-behind only, seconds entries wait to be written in one batch.
+                            Entries still queued are lost if the process is killed, lower is
+                            more durable; flush() and close() write them right away
+            write_queue_size: Write-behind only, maximum number of queued writes. Storing waits
+                              for the writer thread beyond it, nothing is dropped
+            remote: Shared cache behind the local one, a RemoteCache or its URL ('redis://host:6379/0',
+                    'http://host/cache', 'memory://'). On a miss the entries of the page are fetched
+                    from it and kept locally, new entries are sent to it in the background.
+                    Defaults to env AUTOWING_CACHE_REMOTE
+            url_normalizer: Turns a page URL into the partition key entries are grouped and loaded by,
+                            defaults to UrlNormalizer() (drops the query string and ID-like path segments).
+                            Processes sharing a cache should use the same normalization
         """
+        if eviction_policy not in ("lru", "lfu"):
+            raise ValueError(f"Unsupported eviction policy: {eviction_policy}")
+        if entry_format not in ("compact", "full"):
+            raise ValueError(f"Unsupported entry format: {entry_format}")
+        if context_mode not in ("exact", "structural"):
+            raise ValueError(f"Unsupported context mode: {context_mode}")
         self.cache_dir = cache_dir
         self.ttl_days = ttl_days
         self.similarity_threshold = similarity_threshold
-        self.vectorizer = ImprovedTFIDFVectorizer(ngram_range=(1, 2), max_features=500)
-        os.makedirs(cache_dir, exist_ok=True)
-        self._load_existing_cache()
+        self.vectorizer = self._create_vectorizer(vectorizer)
+        self._storage_option = storage
+        self._storage: Optional[CacheStorage] = None
+        self.shared = bool(os.getenv("PYTEST_XDIST_WORKER")) if shared is None else shared
+        if read_only is None:
+            read_only = os.getenv("AUTOWING_CACHE_READ_ONLY", "").lower() in ("1", "true", "yes")
+        self.read_only = read_only
+        if write_behind is None:
+            write_behind = os.getenv("AUTOWING_CACHE_WRITE_BEHIND", "").lower() in ("1", "true", "yes")
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.write_queue_size = write_queue_size
+        remote = remote or os.getenv("AUTOWING_CACHE_REMOTE") or None
+        self.remote = create_remote_cache(remote) if isinstance(remote, str) else remote
+        # Contexts already fetched from the remote cache
+        self._fetched_contexts = set()
+        self.url_normalizer = url_normalizer or UrlNormalizer()
+        self.sync_interval = sync_interval
+        self._sync_token = None
+        self._last_sync = 0.0
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.eviction_policy = eviction_policy
+        self.entry_format = entry_format
+        self.compression = compression or os.getenv("AUTOWING_CACHE_COMPRESSION") or None
+        # Approximate [count, bytes] of the storage, tracked between exact reads
+        self._stored_stats: Optional[List[int]] = None
+        # Access counts not persisted yet, key -> usage increment
+        self._pending_usage: Dict[str, int] = defaultdict(int)
+        self.statistics = CacheStatistics()
+        self.ann = self._create_ann(ann)
+        self.ann_min_entries = ann_min_entries
+        # Persisted signatures not indexed yet, read on first use
+        self._stored_signatures: Optional[Dict[str, List[int]]] = None
+        self._ann_dirty = False
+        self.context_mode = context_mode
+        self.structural = StructuralFingerprint(volatile_fields) if context_mode == "structural" else None
+        self.structure_threshold = structure_threshold
+        # action context hash -> page key and element signatures, for structural matching
+        self._context_structures: Dict[str, tuple] = {}
+
+        self.cache_entries: List[CacheEntry] = []
+        # cache key -> entry, for exact prompt + context matches
+        self._key_index: Dict[str, CacheEntry] = {}
+        # context hash -> entries and vectors recorded against that context
+        self._buckets: Dict[str, ContextBucket] = {}
+        # context hashes and partitions loaded from storage so far, unless everything is loaded
+        self._loaded_contexts = set()
+        self._loaded_partitions = set()
+        self._fully_loaded = False
+        self._lock = threading.RLock()
+
+        atexit.register(_flush_usage_at_exit, weakref.ref(self))
+        if preload:
+            threading.Thread(target=self._ensure_loaded, name="autowing-cache-preload", daemon=True).start()
+
+    @property
+    def storage(self) -> CacheStorage:
+        """The storage backend, created on first use"""
+        if self._storage is None:
+            with self._lock:
+                if self._storage is None and self.read_only:
+                    storage = ReadOnlyStorage(self._open_read_only_storage(self._storage_option))
+                    if self.remote is not None:
+                        storage = TieredStorage(storage, ReadOnlyStorage(RemoteStorage(self.remote)))
+                    self._storage = storage
+                elif self._storage is None:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    # Other processes may be creating or migrating the same store
+                    with FileLock(os.path.join(self.cache_dir, ".lock")):
+                        storage = self._create_storage(self._storage_option)
+                        self._backfill_partitions(storage)
+                    if self.write_behind:
+                        storage = WriteBehindStorage(storage, self.flush_interval, self.write_queue_size)
+                    if self.remote is not None:
+                        # Writes propagate to the remote cache in the background
+                        storage = TieredStorage(storage, WriteBehindStorage(RemoteStorage(self.remote),
+                                                                            self.flush_interval,
+                                                                            self.write_queue_size))
+                    self._storage = storage
+        return self._storage
+
+    @staticmethod
+    def _create_vectorizer(name: str) -> ImprovedTFIDFVectorizer:
+        """Create the prompt vectorizer by name"""
+        if name == "hashing":
+            return HashingVectorizer(ngram_range=(1, 2), n_features=1024)
+        if name == "tfidf":
+            return ImprovedTFIDFVectorizer(ngram_range=(1, 2), max_features=500)
+        raise ValueError(f"Unsupported vectorizer: {name}")
+
+    @staticmethod
+    def _create_ann(ann: Union[str, MinHashLSH, None]) -> Optional[MinHashLSH]:
+        """Create the approximate nearest neighbour index by name"""
+        if ann is None or isinstance(ann, MinHashLSH):
+            return ann
+        if ann == "minhash":
+            return MinHashLSH()
+        raise ValueError(f"Unsupported ANN index: {ann}")
+
+    @property
+    def _ann_path(self) -> str:
+        return os.path.join(self.cache_dir, "ann-minhash.bin")
+
+    def _ann_add(self, entry: CacheEntry) -> None:
+        """Index the MinHash signature of an entry, reusing the persisted one"""
+        if self._stored_signatures is None:
+            self._stored_signatures = self.ann.load_signatures(self._ann_path)
+        signature = self._stored_signatures.pop(entry.key, None)
+        if signature is None:
+            signature = self.ann.signature(self.vectorizer._text_ngrams(entry.prompt))
+            self._ann_dirty = True
+        self.ann.add(entry.key, signature)
+
+    def save_ann(self) -> None:
+        """Persist the ANN signatures next to the cache store, if they changed"""
+        with self._lock:
+            if self.ann is None or not self._ann_dirty or self.read_only:
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Keep the signatures of entries this process did not load
+            extra = {} if self._fully_loaded else self._stored_signatures
+            count = self.ann.save(self._ann_path, extra)
+            self._ann_dirty = False
+        logger.debug(f"💾 Saved {count} ANN signatures")
+
+    def _create_storage(self, storage: Union[str, CacheStorage, None]) -> CacheStorage:
+        """Create the storage backend, migrating a JSON cache directory into a new SQLite store"""
+        if isinstance(storage, CacheStorage):
+            return storage
+
+        name = (storage or os.getenv("AUTOWING_CACHE_STORAGE", "sqlite")).lower()
+        if name == "json":
+            return JsonDirStorage(self.cache_dir)
+        if name == "sqlite":
+            db_path = os.path.join(self.cache_dir, "cache.db")
+            migrate = not os.path.exists(db_path) and any(
+                filename.endswith('.json') for filename in os.listdir(self.cache_dir)
+            )
+            sqlite_storage = SQLiteStorage(db_path, compression=self.compression)
+            if migrate:
+                records = [self._migrated_record(record) for record in JsonDirStorage(self.cache_dir).load_all()
+                           if 'prompt' in record and 'response' in record]
+                sqlite_storage.put_many(records)
+                logger.info(f"📦 Migrated {len(records)} JSON cache files into {db_path}")
+            return sqlite_storage
+        raise ValueError(f"Unsupported cache storage: {name}")
+
+    def _migrated_record(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Storage record of a JSON cache file moved into the SQLite store"""
+        migrated = self._build_record(record['key'], record['prompt'], record.get('context', {}),
+                                      record['response'], record['timestamp'],
+                                      record.get('usage_count', 1), record.get('last_accessed'),
+                                      context_hash=record.get('context_hash'), cost=record.get('cost'))
+        if 'context' not in record:
+            # Compact records only keep a fingerprint of their page: carry over what was
+            # derived from it instead of deriving it again from an empty context
+            migrated.pop('context', None)
+            migrated['partition'] = (record['partition'] if 'partition' in record
+                                     else self.url_normalizer(record_url(record)))
+            for field in ('fingerprint', 'structure'):
+                if field in record:
+                    migrated[field] = record[field]
+                else:
+                    migrated.pop(field, None)
+        return migrated
+
+    def _backfill_partitions(self, storage: CacheStorage) -> None:
+        """Assign a partition to entries stored before partitions existed"""
+        if not storage.supports_partial_load:
+            # Everything is loaded at once anyway, partitions are derived when loading
+            return
+        records = [record for record in storage.load_partition('') if 'partition' not in record]
+        for record in records:
+            record['partition'] = self.url_normalizer(record_url(record))
+        if records:
+            storage.put_many(records)
+            logger.info(f"🗂️ Assigned {len(records)} cache entries to page partitions")
+
+    def _partition_key(self, context: dict) -> str:
+        """Partition of a page context: its normalized URL or app activity"""
+        if not isinstance(context, dict):
+            return ''
+        return self.url_normalizer(str(context.get('url') or context.get('activity') or ''))
+
+    def _open_read_only_storage(self, storage: Union[str, CacheStorage, None]) -> CacheStorage:
+        """Open the existing storage without creating or migrating anything"""
+        if isinstance(storage, CacheStorage):
+            return storage
+
+        name = (storage or os.getenv("AUTOWING_CACHE_STORAGE", "sqlite")).lower()
+        if name not in ("json", "sqlite"):
+            raise ValueError(f"Unsupported cache storage: {name}")
+        db_path = os.path.join(self.cache_dir, "cache.db")
+        if name == "sqlite" and os.path.exists(db_path):
+            return SQLiteStorage(db_path, read_only=True)
+        if os.path.isdir(self.cache_dir):
+            # Not migrated yet, read the JSON files in place
+            return JsonDirStorage(self.cache_dir, read_only=True)
+        return MemoryStorage()
+
+    def _rebuild_vectors(self) -> None:
+        """Vectorize all cached prompts from scratch and regroup them by context hash"""
+        self._key_index = {entry.key: entry for entry in self.cache_entries}
+        self._buckets = {}
+        if not self.cache_entries:
+            return
+
+        prompts = [entry.prompt for entry in self.cache_entries]
+        for entry, vector in zip(self.cache_entries, self.vectorizer.fit_transform(prompts)):
+            self._buckets.setdefault(entry.context_hash, ContextBucket()).append(entry, vector)
+            if self.ann is not None and entry.key not in self.ann:
+                self._ann_add(entry)
+
+    def _index_new_entry(self, entry: CacheEntry) -> None:
+        """Add the vector of a newly cached prompt to its context bucket"""
+        self._key_index[entry.key] = entry
+        if self.vectorizer.incremental:
+            bucket = self._buckets.setdefault(entry.context_hash, ContextBucket())
+            bucket.append(entry, self.vectorizer.transform([entry.prompt])[0])
+            if self.ann is not None:
+                self._ann_add(entry)
+        else:
+            self._rebuild_vectors()
+
+    def _ensure_loaded(self, context_hash: Optional[str] = None, partition: Optional[str] = None) -> None:
+        """
+        Load cache entries from storage on demand.
+
+        Args:
+            context_hash: Only the entries of this context are needed
+            partition: Only the entries of this page are needed, they are loaded together
+                       the first time the page is visited.
+                       Entries are loaded by partition, or by context without one, when the storage
+                       is indexed and the vectorizer is incremental; otherwise the whole cache is loaded once.
+        """
+        if self._fully_loaded or context_hash in self._loaded_contexts or partition in self._loaded_partitions:
+            return
+
+        with self._lock:
+            if (self._fully_loaded or context_hash in self._loaded_contexts
+                    or partition in self._loaded_partitions):
+                return
+            if self._sync_token is None:
+                # Everything written after this point is picked up by refresh()
+                self._sync_token = self.storage.change_token()
+                self._last_sync = time.monotonic()
+            partial = self.storage.supports_partial_load and self.vectorizer.incremental
+            if partial and partition is not None:
+                self._load_records(self.storage.load_partition(partition))
+                self._loaded_partitions.add(partition)
+            # Structural matching compares the current page with every known one of the same page
+            elif partial and context_hash is not None and self.structural is None:
+                self._load_records(self.storage.load_context(context_hash))
+                self._loaded_contexts.add(context_hash)
+            else:
+                self._load_existing_cache()
 
     def _load_existing_cache(self):
         """Load existing cache entries and build similarity index"""
-        self.cache_entries: List[CacheEntry] = []
-        self.prompt_vectors = []
-        
-        # Load all existing cache files
-        for filename in os.listdir(self.cache_dir):
-            if not filename.endswith('.json'):
-                continue
-                
-            filepath = os.path.join(self.cache_dir, filename)
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    cache_data = json.load(f)
-                
-                cached_time = datetime.fromisoformat(cache_data['timestamp'])
-                # Skip expired entries
-                if datetime.now() - cached_time > timedelta(days=self.ttl_days):
-                    os.remove(filepath)
+        with self._lock:
+            self._load_records(self.storage.load_all())
+            self._fully_loaded = True
+            self._loaded_contexts.clear()
+            self._loaded_partitions.clear()
+
+    def refresh(self) -> int:
+        """
+        Pick up entries written to the storage by other processes since the last load or refresh,
+        without reloading the whole cache.
+
+        Returns:
+            int: Number of new or updated entries
+        """
+        with self._lock:
+            if self._sync_token is None:
+                # Nothing is loaded yet, the next lookup reads the current state anyway
+                return 0
+            records, self._sync_token = self.storage.changes_since(self._sync_token)
+            self._last_sync = time.monotonic()
+
+            changed = 0
+            new_records = []
+            for record in records:
+                entry = self._entry_from_record(record)
+                if entry is None:
                     continue
-                
-                # Create cache entry
-                entry = CacheEntry(
-                    key=filename.replace('.json', ''),
-                    prompt=cache_data['prompt'],
-                    context_hash=self._generate_context_hash(cache_data.get('context', {})),
-                    response=cache_data['response'],
-                    timestamp=cached_time
-                )
-                
-                self.cache_entries.append(entry)
-                
-            except (json.JSONDecodeError, KeyError, ValueError):
-                # Remove invalid cache files
-                os.remove(filepath)
-        
-        # Build TF-IDF vectors for all prompts
-        if self.cache_entries:
-            prompts = [entry.prompt for entry in self.cache_entries]
-            self.prompt_vectors = self.vectorizer.fit_transform(prompts)
+                if (not self._fully_loaded and entry.context_hash not in self._loaded_contexts
+                        and entry.partition not in self._loaded_partitions):
+                    # Loaded together with its context when that is first needed
+                    continue
+                existing_entry = self._key_index.get(entry.key)
+                if existing_entry is None:
+                    new_records.append(record)
+                elif entry.timestamp > existing_entry.timestamp:
+                    existing_entry.response = entry.response
+                    existing_entry.timestamp = entry.timestamp
+                    changed += 1
+
+            before = len(self.cache_entries)
+            self._load_records(new_records)
+            changed += len(self.cache_entries) - before
+
+        if changed:
+            logger.debug(f"🔄 Picked up {changed} cache entries written by other processes")
+        return changed
+
+    def _load_records(self, records) -> None:
+        """Add stored records that are not loaded yet to the in-memory index"""
+        stale_keys = []
+        new_entries = []
+        for record in records:
+            if record['key'] in self._key_index:
+                continue
+            entry = self._entry_from_record(record)
+            # Skip invalid and expired entries
+            if entry is None or datetime.now() - entry.timestamp > timedelta(days=self.ttl_days):
+                stale_keys.append(record['key'])
+                continue
+            new_entries.append(entry)
+            self._remember_structure(entry.context_hash, record.get('structure'))
+
+        if stale_keys:
+            self.storage.delete(stale_keys)
+
+        self.cache_entries.extend(new_entries)
+        if self.vectorizer.incremental:
+            for entry in new_entries:
+                self._index_new_entry(entry)
+        elif new_entries:
+            # Build vectors for all prompts
+            self._rebuild_vectors()
+
+    def _entry_from_record(self, record: Dict[str, Any]) -> Optional[CacheEntry]:
+        """Create a cache entry from a stored record, None if the record is invalid"""
+        try:
+            return CacheEntry(
+                key=record['key'],
+                prompt=record['prompt'],
+                # Records written before the hash was stored only carry the context
+                context_hash=record.get('context_hash') or self._generate_context_hash(record.get('context', {})),
+                response=record['response'],
+                timestamp=datetime.fromisoformat(record['timestamp']),
+                usage_count=record.get('usage_count', 1),
+                last_accessed=datetime.fromisoformat(record['last_accessed']) if record.get('last_accessed') else None,
+                compute_time=record.get('cost', {}).get('seconds', 0.0),
+                compute_tokens=record.get('cost', {}).get('tokens', 0),
+                partition=record['partition'] if 'partition' in record else self.url_normalizer(record_url(record))
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def _remember_structure(self, context_hash: str, structure: Optional[Dict[str, Any]]) -> None:
+        """Keep the structural fingerprint stored with an action entry"""
+        if self.structural is None or not isinstance(structure, dict):
+            return
+        if context_hash not in self._context_structures:
+            self._context_structures[context_hash] = (structure.get('page', ''),
+                                                      frozenset(structure.get('elements', [])))
+
+    def _resolve_structural_context(self, context: dict, context_hash: str) -> str:
+        """
+        Context hash to look actions up in: the page's own, or the one of the known page
+        with the same address and the most similar element set above structure_threshold.
+        """
+        if context_hash in self._buckets:
+            return context_hash
+
+        page, signatures = self.structural.structure(context)
+        best_hash, best_similarity = context_hash, self.structure_threshold
+        for other_hash, (other_page, other_signatures) in self._context_structures.items():
+            if other_page != page or other_hash not in self._buckets:
+                continue
+            similarity = jaccard(signatures, other_signatures)
+            if similarity >= best_similarity:
+                best_hash, best_similarity = other_hash, similarity
+
+        if best_hash != context_hash:
+            logger.debug(f"🧩 Structurally similar page context (similarity: {best_similarity:.2f})")
+        return best_hash
 
     def _generate_context_hash(self, context: dict) -> str:
         """Generate a stable hash for context that ignores dynamic elements"""
+        if self.structural is not None:
+            return self.structural.context_hash(context)
         # Remove dynamic fields that change between executions
         stable_context = {}
         if isinstance(context, dict):
@@ -245,6 +736,76 @@ class IntelligentCacheManager:
             json.dumps(stable_context, sort_keys=True).encode()
         ).hexdigest()
 
+    def _build_record(self, key: str, prompt: str, context: dict, response: Any, timestamp: str,
+                      usage_count: int = 1, last_accessed: Optional[str] = None,
+                      context_hash: Optional[str] = None, cost: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Build the storage record of an entry in the configured entry format"""
+        record = {
+            'key': key,
+            'timestamp': timestamp,
+            'prompt': prompt,
+            'partition': self._partition_key(context),
+            'context_hash': context_hash or self._generate_context_hash(context),
+            'response': response,
+            'usage_count': usage_count,
+            'last_accessed': last_accessed or timestamp
+        }
+        if cost:
+            record['cost'] = cost
+        if self.structural is not None and ':' not in record['context_hash']:
+            # Actions can be reused on similar pages, keep what is needed to compare them
+            page, signatures = self.structural.structure(context)
+            record['structure'] = {'page': page, 'elements': sorted(signatures)}
+        if self.entry_format == "full":
+            record['context'] = context
+        else:
+            record['fingerprint'] = self._context_fingerprint(context, response)
+        return record
+
+    @staticmethod
+    def _context_fingerprint(context: dict, response: Any) -> Dict[str, Any]:
+        """
+        Small description of the page an entry was recorded on: URL, title and, for
+        instructions with a selector, the element the selector refers to.
+        """
+        if not isinstance(context, dict):
+            return {}
+        fingerprint = {k: context[k] for k in ('url', 'title') if context.get(k)}
+
+        selector = response.get('selector') if isinstance(response, dict) else None
+        if not isinstance(selector, str) or not selector:
+            return fingerprint
+
+        for element in context.get('elements') or []:
+            if not isinstance(element, dict):
+                continue
+            for field_name in ('id', 'name', 'placeholder', 'aria', 'text'):
+                value = element.get(field_name)
+                if isinstance(value, str) and 0 < len(value) <= 100 and value in selector:
+                    target = {k: element[k] for k in ('tag', 'type', 'id', 'name', 'placeholder', 'aria')
+                              if element.get(k)}
+                    if element.get('text'):
+                        target['text'] = str(element['text'])[:50]
+                    fingerprint['target'] = target
+                    return fingerprint
+        return fingerprint
+
+    def _scoped_context_hash(self, context: dict, operation: str, format_hint: str) -> str:
+        """
+        Context hash of an operation. Actions use the plain context hash, other operations
+        (queries, assertions, ...) get their own buckets per operation and format hint so
+        their responses never answer another kind of request.
+        """
+        context_hash = self._generate_context_hash(context)
+        if operation == "action":
+            return context_hash
+        return f"{operation}:{format_hint}:{context_hash}"
+
+    @staticmethod
+    def _make_cache_key(prompt: str, context_hash: str) -> str:
+        """Deterministic cache key of a prompt recorded against a context"""
+        return hashlib.md5(f"{prompt}:{context_hash}".encode()).hexdigest()
+
     def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
         """Calculate cosine similarity between two vectors"""
         if not vec1 or not vec2 or len(vec1) != len(vec2):
@@ -265,7 +826,7 @@ class IntelligentCacheManager:
 
     def _calculate_similarity(self, prompt1: str, prompt2: str) -> float:
         """Calculate semantic similarity between two prompts"""
-        if not self.prompt_vectors or not self.cache_entries:
+        if not self._buckets or not self.cache_entries:
             return 0.0
             
         # Transform both prompts
@@ -276,47 +837,142 @@ class IntelligentCacheManager:
         vec1, vec2 = vectors[0], vectors[1]
         return self._cosine_similarity(vec1, vec2)
 
-    def get_intelligent(self, prompt: str, context: dict) -> Optional[Any]:
+    def get_intelligent(self, prompt: str, context: dict, operation: str = "action",
+                        format_hint: str = "") -> Optional[Any]:
         """
         Get cached response using intelligent matching based on semantic similarity.
         
         Args:
             prompt: The prompt to search for
             context: Current context to match against
+            operation: Kind of request, 'action', 'query', 'assert', ...
+                       Only actions are matched semantically, other operations need the exact prompt
+            format_hint: Requested result format (e.g. 'string[]'), part of the cache key
             
         Returns:
             Cached response if found, None otherwise
         """
-        if not self.cache_entries:
+        entry = self.get_intelligent_entry(prompt, context, operation, format_hint)
+        return entry.response if entry is not None else None
+
+    def get_intelligent_entry(self, prompt: str, context: dict, operation: str = "action",
+                              format_hint: str = "") -> Optional[CacheEntry]:
+        """
+        Same as get_intelligent(), but return the matching entry, whose key can be
+        passed to invalidate() when its response turns out to be wrong.
+
+        Returns:
+            The matching cache entry if found, None otherwise
+        """
+        start_time = time.perf_counter()
+        current_context_hash = self._scoped_context_hash(context, operation, format_hint)
+        semantic = operation == "action"
+        self._ensure_loaded(current_context_hash, self._partition_key(context))
+        if self.structural is not None and semantic:
+            with self._lock:
+                current_context_hash = self._resolve_structural_context(context, current_context_hash)
+
+        match, hit = self._lookup(prompt, current_context_hash, semantic)
+        if match is None and self.shared and time.monotonic() - self._last_sync >= self.sync_interval:
+            # Another worker may have cached it meanwhile
+            if self.refresh():
+                match, hit = self._lookup(prompt, current_context_hash, semantic)
+        if match is None and self.remote is not None and current_context_hash not in self._fetched_contexts:
+            if self._fetch_remote(current_context_hash):
+                match, hit = self._lookup(prompt, current_context_hash, semantic)
+
+        if match is None:
+            self.statistics.record_lookup(time.perf_counter() - start_time)
             return None
-            
-        current_context_hash = self._generate_context_hash(context)
-        best_match: Optional[CacheEntry] = None
-        best_similarity = 0.0
-        
-        # Search for best matching entry
-        for entry in self.cache_entries:
-            # First check if context is compatible
-            if entry.context_hash != current_context_hash:
-                continue
-                
-            # Calculate semantic similarity
-            similarity = self._calculate_similarity(prompt, entry.prompt)
-            
-            # Update best match if this is better
-            if similarity > best_similarity and similarity >= self.similarity_threshold:
-                best_similarity = similarity
-                best_match = entry
-        
-        if best_match:
-            best_match.similarity_score = best_similarity
-            best_match.usage_count += 1
-            logger.debug(f"🧠 Intelligent cache hit (similarity: {best_similarity:.2f}): {prompt}")
-            return best_match.response
-            
-        return None
+        self.statistics.record_lookup(time.perf_counter() - start_time, hit, match.similarity_score,
+                                      match.compute_time, match.compute_tokens)
+        return match
+
+    def _fetch_remote(self, context_hash: str) -> int:
+        """
+        Fetch the entries of a context from the remote cache, once per context.
+
+        Returns:
+            int: Number of new entries
+        """
+        self._fetched_contexts.add(context_hash)
+        records = self.storage.fetch_context(context_hash)
+        if not records:
+            return 0
+        with self._lock:
+            before = len(self._key_index)
+            self._load_records(records)
+            count = len(self._key_index) - before
+        logger.debug(f"☁️ Fetched {count} cache entries from the remote cache")
+        return count
+
+    def _lookup(self, prompt: str, current_context_hash: str, semantic: bool = True):
+        """
+        Exact then, if enabled, semantic lookup in the loaded entries of a context.
 
-    def set_intelligent(self, prompt: str, context: dict, response: Any) -> None:
+        Returns:
+            The matching entry and the hit type ('exact' or 'semantic'), (None, None) on a miss
+        """
+        with self._lock:
+            # Exact match: same prompt on the same context, no vectorization needed
+            exact_match = self._key_index.get(self._make_cache_key(prompt, current_context_hash))
+            if exact_match is not None:
+                exact_match.similarity_score = 1.0
+                self._record_access(exact_match)
+                logger.debug(f"🎯 Exact cache hit: {prompt}")
+                return exact_match, "exact"
+
+            # Only entries recorded against the same context are candidates
+            bucket = self._buckets.get(current_context_hash)
+            if bucket is None or not semantic:
+                return None, None
+
+            # Vectorize the prompt once and score it against the bucket's vectors
+            query_vector = self.vectorizer.transform([prompt])[0]
+            if self.ann is not None and len(bucket.entries) >= self.ann_min_entries:
+                # Only rerank the ANN candidates by exact cosine similarity
+                candidates = self.ann.query(self.ann.signature(self.vectorizer._text_ngrams(prompt)))
+                rows = [bucket.positions[key] for key in candidates if key in bucket.positions]
+                best_row, best_similarity = bucket.index.best(query_vector, rows)
+            else:
+                best_row, best_similarity = bucket.index.best(query_vector)
+
+            best_match: Optional[CacheEntry] = None
+            if best_row >= 0 and best_similarity >= self.similarity_threshold:
+                best_match = bucket.entries[best_row]
+
+            if best_match:
+                best_match.similarity_score = best_similarity
+                self._record_access(best_match)
+                logger.debug(f"🧠 Intelligent cache hit (similarity: {best_similarity:.2f}): {prompt}")
+                return best_match, "semantic"
+
+        return None, None
+
+    def _record_access(self, entry: CacheEntry) -> None:
+        """Update access metadata of a hit entry, persisted in batches"""
+        entry.usage_count += 1
+        entry.last_accessed = datetime.now()
+        self._pending_usage[entry.key] += 1
+        if len(self._pending_usage) >= self.usage_flush_threshold:
+            self.flush_usage()
+
+    def flush_usage(self) -> None:
+        """Persist pending access metadata"""
+        with self._lock:
+            if not self._pending_usage:
+                return
+            updates = []
+            for key, usage_increment in self._pending_usage.items():
+                entry = self._key_index.get(key)
+                if entry is not None:
+                    updates.append((key, usage_increment, entry.last_accessed.isoformat()))
+            self._pending_usage.clear()
+            self.storage.update_usage(updates)
+
+    def set_intelligent(self, prompt: str, context: dict, response: Any,
+                        compute_time: float = 0.0, compute_tokens: int = 0,
+                        operation: str = "action", format_hint: str = "") -> None:
         """
         Store response in intelligent cache.
         
@@ -324,74 +980,373 @@ class IntelligentCacheManager:
             prompt: The prompt used
             context: Context information
             response: The response to cache
+            compute_time: Seconds the LLM took to compute the response
+            compute_tokens: Estimated tokens used to compute the response
+            operation: Kind of request, 'action', 'query', 'assert', ...
+            format_hint: Requested result format (e.g. 'string[]')
         """
+        start_time = time.perf_counter()
+
         # Generate cache key
-        cache_key = hashlib.md5(f"{prompt}:{self._generate_context_hash(context)}".encode()).hexdigest()
-        
-        # Create new cache entry
-        new_entry = CacheEntry(
-            key=cache_key,
-            prompt=prompt,
-            context_hash=self._generate_context_hash(context),
-            response=response,
-            timestamp=datetime.now()
+        context_hash = self._scoped_context_hash(context, operation, format_hint)
+        cache_key = self._make_cache_key(prompt, context_hash)
+        partition = self._partition_key(context)
+        self._ensure_loaded(context_hash, partition)
+
+        with self._lock:
+            existing_entry = self._key_index.get(cache_key)
+            if existing_entry is not None:
+                # Same prompt and context, the vector is unchanged
+                existing_entry.response = response
+                existing_entry.timestamp = datetime.now()
+                existing_entry.compute_time = compute_time
+                existing_entry.compute_tokens = compute_tokens
+                new_entry = existing_entry
+            else:
+                # Create new cache entry
+                new_entry = CacheEntry(
+                    key=cache_key,
+                    prompt=prompt,
+                    context_hash=context_hash,
+                    response=response,
+                    timestamp=datetime.now(),
+                    compute_time=compute_time,
+                    compute_tokens=compute_tokens,
+                    partition=partition
+                )
+
+                # Add to cache entries
+                self.cache_entries.append(new_entry)
+
+                # Vectorize the new prompt (refits everything for the TF-IDF vectorizer)
+                self._index_new_entry(new_entry)
+
+            # The stored usage count is rewritten below
+            self._pending_usage.pop(cache_key, None)
+
+        # Persist the entry
+        record = self._build_record(
+            cache_key, prompt, context, response, new_entry.timestamp.isoformat(),
+            usage_count=new_entry.usage_count,
+            last_accessed=new_entry.last_accessed.isoformat() if new_entry.last_accessed else None,
+            context_hash=context_hash,
+            cost={'seconds': round(compute_time, 3), 'tokens': compute_tokens} if compute_time or compute_tokens else None
         )
-        
-        # Add to cache entries
-        self.cache_entries.append(new_entry)
-        
-        # Update vectorizer with new prompt
-        prompts = [entry.prompt for entry in self.cache_entries]
-        self.prompt_vectors = self.vectorizer.fit_transform(prompts)
-        
-        # Save to file
-        cache_path = os.path.join(self.cache_dir, f"{cache_key}.json")
-        cache_data = {
-            'timestamp': new_entry.timestamp.isoformat(),
-            'prompt': prompt,
-            'context': context,
-            'response': response
-        }
-        
-        with open(cache_path, 'w', encoding='utf-8') as f:
-            json.dump(cache_data, f, ensure_ascii=False, indent=2)
+        self.storage.put(record)
+        self._remember_structure(context_hash, record.get('structure'))
         
         logger.debug(f"💾 Intelligent cache saved: {prompt}")
 
+        if existing_entry is None:
+            self._enforce_limits(record_size(record))
+        self.statistics.record_store(time.perf_counter() - start_time)
+
+    def invalidate(self, key: str) -> bool:
+        """
+        Remove an entry whose response failed, e.g. a cached instruction whose selector
+        no longer matches the page, so it is recomputed instead of failing again.
+
+        Args:
+            key: Key of the failed entry
+
+        Returns:
+            bool: True if the entry was cached
+        """
+        with self._lock:
+            if key not in self._key_index:
+                return False
+            self.storage.delete([key])
+            self._remove_entries([key])
+            self._stored_stats = None
+        self.statistics.record_invalidation()
+        logger.debug(f"🗑️ Invalidated failed cache entry: {key}")
+        return True
+
+    def invalidate_page(self, url: str) -> int:
+        """
+        Remove the entries of a page, or of every page of a route, e.g. after a redesign.
+
+        Args:
+            url: A URL (or app activity) of the page, normalized into its partition key
+
+        Returns:
+            int: Number of removed entries
+        """
+        partition = self.url_normalizer(url)
+        with self._lock:
+            keys = set(self.storage.delete_partition(partition))
+            # Loaded entries stored without a partition
+            loaded_keys = {entry.key for entry in self.cache_entries if entry.partition == partition} - keys
+            self.storage.delete(loaded_keys)
+            keys.update(loaded_keys)
+            self._remove_entries(keys)
+            self._stored_stats = None
+        logger.info(f"🗑️ Invalidated {len(keys)} cache entries of {partition or 'pages without address'}")
+        return len(keys)
+
+    def _enforce_limits(self, added_bytes: int) -> None:
+        """Evict entries when the store exceeds max_entries or max_bytes"""
+        if self.max_entries is None and self.max_bytes is None:
+            return
+
+        with self._lock:
+            if self._stored_stats is None:
+                self._stored_stats = list(self.storage.stats())
+            else:
+                self._stored_stats[0] += 1
+                self._stored_stats[1] += added_bytes
+            if not self._over_limits(*self._stored_stats):
+                return
+
+            # Persist recent accesses so they count, then check the exact figures
+            self.flush_usage()
+            count, size = self._stored_stats = list(self.storage.stats())
+            if not self._over_limits(count, size):
+                return
+
+            # Evict down to 90% of the limits so eviction doesn't run on every store
+            target_count = int(self.max_entries * 0.9) if self.max_entries is not None else count
+            target_size = int(self.max_bytes * 0.9) if self.max_bytes is not None else size
+            victims = []
+            for key, entry_size in self.storage.eviction_candidates(self.eviction_policy):
+                if count <= target_count and size <= target_size:
+                    break
+                victims.append(key)
+                count -= 1
+                size -= entry_size
+
+            self.storage.delete(victims)
+            self._remove_entries(victims)
+            self._stored_stats = [count, size]
+
+        logger.debug(f"🧹 Evicted {len(victims)} cache entries ({self.eviction_policy})")
+
+    def _over_limits(self, count: int, size: int) -> bool:
+        return ((self.max_entries is not None and count > self.max_entries) or
+                (self.max_bytes is not None and size > self.max_bytes))
+
+    def _remove_entries(self, keys) -> None:
+        """Drop entries from the in-memory index in a single sweep"""
+        keys = {key for key in keys if key in self._key_index}
+        if not keys:
+            return
+
+        removed = [self._key_index.pop(key) for key in keys]
+        for key in keys:
+            self._pending_usage.pop(key, None)
+            if self.ann is not None:
+                self.ann.remove(key)
+                self._ann_dirty = True
+        self.cache_entries = [entry for entry in self.cache_entries if entry.key not in keys]
+
+        if not self.vectorizer.incremental:
+            self._rebuild_vectors()
+            return
+
+        # Hashed vectors stay valid, just drop the removed rows
+        for context_hash in {entry.context_hash for entry in removed}:
+            bucket = self._buckets[context_hash]
+            rows = [row for row, entry in enumerate(bucket.entries) if entry.key not in keys]
+            if not rows:
+                del self._buckets[context_hash]
+                self._context_structures.pop(context_hash, None)
+                continue
+            bucket.entries = [bucket.entries[row] for row in rows]
+            bucket.positions = {entry.key: row for row, entry in enumerate(bucket.entries)}
+            bucket.index.retain(rows)
+
     def get_statistics(self) -> Dict[str, Any]:
-        """Get cache statistics"""
-        total_entries = len(self.cache_entries)
-        if total_entries == 0:
-            return {"total_entries": 0, "hit_rate": 0.0}
-            
-        total_usage = sum(entry.usage_count for entry in self.cache_entries)
-        avg_similarity = sum(entry.similarity_score for entry in self.cache_entries if entry.similarity_score > 0) / max(1, sum(1 for entry in self.cache_entries if entry.similarity_score > 0))
-        
+        """
+        Get cache statistics.
+
+        Lookup, hit, miss and latency counters cover this manager's lifetime.
+        ``llm_time_saved`` and ``tokens_saved`` add up what the hit responses cost
+        when they were first computed.
+        """
+        statistics = self.statistics.to_dict()
         return {
-            "total_entries": total_entries,
-            "total_usage": total_usage,
-            "average_similarity": avg_similarity,
-            "hit_rate": total_usage / total_entries if total_entries > 0 else 0.0
+            "total_entries": self.storage.count(),
+            "loaded_entries": len(self._key_index),
+            "total_usage": statistics["hits"],
+            **statistics
         }
 
     def clear_expired(self) -> None:
-        """Remove expired cache entries"""
-        current_time = datetime.now()
-        expired_entries = []
-        
-        for entry in self.cache_entries:
-            if current_time - entry.timestamp > timedelta(days=self.ttl_days):
-                expired_entries.append(entry)
-                # Remove file
-                cache_path = os.path.join(self.cache_dir, f"{entry.key}.json")
-                if os.path.exists(cache_path):
-                    os.remove(cache_path)
-        
-        # Remove expired entries from memory
-        for entry in expired_entries:
-            self.cache_entries.remove(entry)
-        
-        # Rebuild vectors
-        if self.cache_entries:
-            prompts = [entry.prompt for entry in self.cache_entries]
-            self.prompt_vectors = self.vectorizer.fit_transform(prompts)
+        """Remove expired cache entries, including those not loaded into memory"""
+        cutoff = (datetime.now() - timedelta(days=self.ttl_days)).isoformat()
+        with self._lock:
+            expired_keys = self.storage.expired_keys(cutoff)
+            if not expired_keys:
+                return
+
+            self.storage.delete(expired_keys)
+            self._remove_entries(expired_keys)
+            self._stored_stats = None
+
+    def compact(self) -> None:
+        """Reclaim storage space left by deleted or replaced entries"""
+        self.storage.compact()
+
+    def export_json(self, export_dir: str) -> int:
+        """
+        Export all stored entries in the per-file JSON layout.
+
+        Args:
+            export_dir: Directory to write the ``<key>.json`` files into
+
+        Returns:
+            int: Number of exported entries
+        """
+        return copy_records(self.storage, JsonDirStorage(export_dir))
+
+    def export_bundle(self, path: str, url_pattern: Optional[str] = None,
+                      max_age_days: Optional[float] = None, min_usage: Optional[int] = None) -> int:
+        """
+        Export stored entries into a single compressed bundle file, e.g. to warm up CI agents.
+
+        Args:
+            path: The bundle file to write
+            url_pattern: Only export entries cached on pages matching this shell-style pattern
+            max_age_days: Only export entries created in the last max_age_days days
+            min_usage: Only export entries used at least min_usage times
+
+        Returns:
+            int: Number of exported entries
+        """
+        self.flush_usage()
+        records = filter_records(self.storage.load_all(), url_pattern, max_age_days, min_usage)
+        count = write_bundle(path, records, context_mode=self.context_mode, filters={'url_pattern': url_pattern, 'max_age_days': max_age_days,
+                                                     'min_usage': min_usage})
+        logger.info(f"📦 Exported {count} cache entries into {path}")
+        return count
+
+    def import_bundle(self, path: str) -> int:
+        """
+        Merge a bundle into the cache. Entries missing from the cache or newer in the
+        bundle are imported. In read-only mode they are only loaded into memory.
+
+        Args:
+            path: The bundle file to read
+
+        Returns:
+            int: Number of imported entries
+        """
+        header, records = read_bundle(path)
+        if header.get('context_mode', self.context_mode) != self.context_mode:
+            logger.warning(f"⚠️ Bundle was exported in {header['context_mode']} context mode, "
+                           f"the cache uses {self.context_mode}: entries may not match")
+        with self._lock:
+            if self.read_only:
+                before = len(self._key_index)
+                self._load_records(records)
+                count = len(self._key_index) - before
+            else:
+                newer = []
+                for record in records:
+                    existing = self.storage.get(record['key'])
+                    if existing is None or existing['timestamp'] < record['timestamp']:
+                        newer.append(record)
+                self.storage.put_many(newer)
+                count = len(newer)
+                # Update the loaded entries, the others are read when needed
+                self.refresh()
+                self._stored_stats = None
+        if not self.read_only:
+            self._enforce_limits(0)
+        logger.info(f"📦 Imported {count} cache entries from {path}")
+        return count
+
+    def flush(self) -> None:
+        """Persist pending access metadata and, in write-behind mode, the queued entries"""
+        if self._storage is None:
+            return
+        self.flush_usage()
+        self._storage.flush()
+
+    def close(self) -> None:
+        """Persist pending access metadata and ANN signatures, and close the storage backend"""
+        self.save_ann()
+        if self._storage is not None:
+            self.flush_usage()
+            self._storage.close()
+            self._storage = None
+
+
+class CacheManagerRegistry:
+    """
+    Process-wide registry of shared, reference-counted cache managers.
+    Fixtures using the same cache directory and configuration share one
+    in-memory index and one set of statistics.
+    """
+
+    _managers: Dict[tuple, List[Any]] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _freeze(value: Any) -> Any:
+        """Hashable equivalent of an option value: lists become tuples, sets frozensets"""
+        if isinstance(value, dict):
+            return tuple(sorted((key, CacheManagerRegistry._freeze(item)) for key, item in value.items()))
+        if isinstance(value, (set, frozenset)):
+            return frozenset(CacheManagerRegistry._freeze(item) for item in value)
+        if isinstance(value, (list, tuple)):
+            return tuple(CacheManagerRegistry._freeze(item) for item in value)
+        return value
+
+    @staticmethod
+    def _registry_key(cache_dir: str, options: Dict[str, Any]) -> tuple:
+        return os.path.abspath(cache_dir), CacheManagerRegistry._freeze(options)
+
+    @classmethod
+    def acquire(cls, cache_dir: str = ".auto-wing/cache", **options) -> IntelligentCacheManager:
+        """
+        Get the shared cache manager of a cache directory and configuration, creating it if needed.
+
+        Args:
+            cache_dir: Directory to store cache files
+            **options: Other IntelligentCacheManager arguments
+
+        Returns:
+            IntelligentCacheManager: The shared manager, to be given back with release()
+        """
+        key = cls._registry_key(cache_dir, options)
+        with cls._lock:
+            if key not in cls._managers:
+                cls._managers[key] = [IntelligentCacheManager(cache_dir=cache_dir, **options), 0]
+            cls._managers[key][1] += 1
+            return cls._managers[key][0]
+
+    @classmethod
+    def release(cls, manager: IntelligentCacheManager) -> None:
+        """
+        Give back a manager obtained from acquire(), closing it when it is no longer used.
+
+        Args:
+            manager: The shared manager
+        """
+        with cls._lock:
+            for key, (shared_manager, ref_count) in cls._managers.items():
+                if shared_manager is manager:
+                    if ref_count > 1:
+                        cls._managers[key][1] -= 1
+                        return
+                    del cls._managers[key]
+                    break
+            else:
+                return
+        manager.close()
+
+
+def _flush_usage_at_exit(manager_ref) -> None:
+    """Persist access metadata, queued entries and ANN signatures of a cache manager still alive at interpreter exit"""
+    manager = manager_ref()
+    if manager is not None and manager._storage is not None:
+        try:
+            manager.flush()
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to persist cache usage: {e}")
+        # Saved on their own, a failed flush must not lose the signatures
+        try:
+            manager.save_ann()
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to save the ANN signatures: {e}")
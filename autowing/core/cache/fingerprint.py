@@ -0,0 +1,137 @@
+"""
+Structural page fingerprints.
+
+A page is described by the multiset of its element signatures: element fields with
+volatile fields (typed values, generated IDs, positions) dropped and text
+normalized, so counters, dates and times don't make two renderings of the same
+page look different. Pages are compared by the Jaccard similarity of their sets.
+"""
+import hashlib
+import json
+import re
+import zlib
+from collections import Counter
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+_DATE_PATTERN = re.compile(r"\d{4}[-/.年]\d{1,2}[-/.月]\d{1,2}日?|\d{1,2}[-/.]\d{1,2}[-/.]\d{4}")
+_TIME_PATTERN = re.compile(r"\d{1,2}:\d{2}(?::\d{2})?(?:\s?[ap]m)?", re.IGNORECASE)
+_NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+_SPACE_PATTERN = re.compile(r"\s+")
+
+# Element fields that change without the page structure changing (scrolling changes
+# positions and the viewport flags)
+DEFAULT_VOLATILE_FIELDS = ('value', 'autowingId', 'boundingBox', 'offscreen', 'occluded')
+
+# Longest text kept in an element signature
+_MAX_TEXT_LENGTH = 50
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for structural comparison: dates, times and numbers are replaced
+    by placeholders, whitespace is collapsed.
+
+    Args:
+        text: The text
+
+    Returns:
+        str: The normalized text
+    """
+    text = _DATE_PATTERN.sub('<date>', text)
+    text = _TIME_PATTERN.sub('<time>', text)
+    text = _NUMBER_PATTERN.sub('0', text)
+    return _SPACE_PATTERN.sub(' ', text).strip().lower()
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """
+    Jaccard similarity of two sets, 1.0 for two empty sets.
+    """
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class StructuralFingerprint:
+    """
+    Builds structural fingerprints of page contexts.
+    """
+
+    def __init__(self, volatile_fields: Optional[Iterable[str]] = None):
+        """
+        Initialize the fingerprint builder.
+
+        Args:
+            volatile_fields: Element fields ignored by the fingerprint,
+                             defaults to DEFAULT_VOLATILE_FIELDS
+        """
+        self.volatile_fields = frozenset(DEFAULT_VOLATILE_FIELDS if volatile_fields is None else volatile_fields)
+
+    def _normalize_value(self, value: Any) -> str:
+        if isinstance(value, str):
+            return normalize_text(value)[:_MAX_TEXT_LENGTH]
+        return normalize_text(json.dumps(value, sort_keys=True, ensure_ascii=False))[:_MAX_TEXT_LENGTH]
+
+    def element_signature(self, element: Dict[str, Any]) -> str:
+        """
+        Short signature of an element's stable fields.
+
+        Args:
+            element: Element information from the page context
+
+        Returns:
+            str: 8 hex digits
+        """
+        parts = [f"{field}={self._normalize_value(value)}" for field, value in sorted(element.items())
+                 if field not in self.volatile_fields and value not in (None, '')]
+        return format(zlib.crc32('|'.join(parts).encode('utf-8')), '08x')
+
+    def page_key(self, context: Dict[str, Any]) -> str:
+        """
+        Normalized page address: the URL with its query string and fragment removed,
+        or the app activity.
+        """
+        address = context.get('url') or context.get('activity') or ''
+        return normalize_text(str(address).split('#', 1)[0].split('?', 1)[0])
+
+    def structure(self, context: Dict[str, Any]) -> Tuple[str, FrozenSet[str]]:
+        """
+        Structural fingerprint of a page context.
+
+        Args:
+            context: The page context
+
+        Returns:
+            Tuple[str, FrozenSet[str]]: Page key and set of element signatures
+        """
+        elements = context.get('elements') if isinstance(context, dict) else None
+        # Repeated elements (list items differing only by numbers) count once per occurrence,
+        # so a list growing by one item changes the similarity by one element
+        occurrences = Counter(self.element_signature(element)
+                              for element in elements or [] if isinstance(element, dict))
+        signatures = frozenset(f"{signature}.{occurrence}" if occurrence else signature
+                               for signature, count in occurrences.items() for occurrence in range(count))
+        return self.page_key(context), signatures
+
+    def context_hash(self, context: Dict[str, Any]) -> str:
+        """
+        Hash of the structural fingerprint, equal for renderings of a page that only
+        differ in volatile fields, numbers, dates or times.
+
+        Args:
+            context: The page context
+
+        Returns:
+            str: md5 hex digest
+        """
+        if not isinstance(context, dict):
+            context = {}
+        page, signatures = self.structure(context)
+        stable_context = {
+            # Other context fields (e.g. the page text hash) must still match exactly
+            key: value for key, value in context.items()
+            if key not in ('url', 'activity', 'title', 'elements', 'elementMarkers')
+        }
+        stable_context.update(page=page, title=normalize_text(str(context.get('title') or '')),
+                              elements=sorted(signatures))
+        return hashlib.md5(json.dumps(stable_context, sort_keys=True).encode()).hexdigest()
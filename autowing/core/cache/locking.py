@@ -0,0 +1,54 @@
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """
+    Advisory inter-process lock on a lock file, used to serialize cache
+    maintenance (migration, compaction) between processes sharing a cache
+    directory, e.g. pytest-xdist workers.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the lock.
+
+        Args:
+            path: Path of the lock file, created if missing
+        """
+        self.path = path
+        self._fd = None
+
+    def acquire(self) -> None:
+        """Block until the lock is held"""
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+
+    def release(self) -> None:
+        """Release the lock"""
+        if self._fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
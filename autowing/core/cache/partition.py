@@ -0,0 +1,90 @@
+"""
+Cache partitions: entries are grouped by a normalized page address, so only the
+pages a test visits are loaded, and the entries of a page or route can be
+invalidated together.
+"""
+import re
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Path segments that identify a record rather than a route
+DEFAULT_ID_PATTERNS = (
+    r"\d+",
+    r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}",
+    r"(?=[a-fA-F]*\d)[0-9a-fA-F]{8,}",
+    r"(?=[\w-]*\d)(?=[\w-]*[a-zA-Z])[\w-]{20,}",
+)
+
+ID_PLACEHOLDER = ":id"
+
+
+def record_url(record: Dict[str, Any]) -> str:
+    """
+    Address of the page a record was cached on: its URL, or the app activity.
+
+    Args:
+        record: A storage record
+
+    Returns:
+        str: The address, empty if unknown
+    """
+    for source in (record.get('fingerprint'), record.get('context')):
+        if isinstance(source, dict):
+            address = source.get('url') or source.get('activity')
+            if address:
+                return address
+    return ''
+
+
+class UrlNormalizer:
+    """
+    Turns a page URL into its partition key: the query string and fragment are
+    dropped and path segments that look like IDs are replaced by ':id', so
+    ``https://shop.example.com/orders/1042?tab=items`` and
+    ``https://shop.example.com/orders/1043`` share the ``https://shop.example.com/orders/:id``
+    partition. Addresses that aren't URLs (app activities) are kept as they are.
+    """
+
+    def __init__(self, keep_query: Iterable[str] = (), id_patterns: Optional[Iterable[str]] = None,
+                 hash_routes: bool = True):
+        """
+        Initialize the normalizer.
+
+        Args:
+            keep_query: Query parameters that select a different page and are kept, e.g. 'page'
+            id_patterns: Regular expressions of path segments to replace by ':id',
+                         defaults to DEFAULT_ID_PATTERNS (numbers, UUIDs, hex and token-like strings)
+            hash_routes: Keep fragments starting with '/' (single page app routes) as part of the path
+        """
+        self.keep_query = frozenset(keep_query)
+        patterns = DEFAULT_ID_PATTERNS if id_patterns is None else tuple(id_patterns)
+        self._id_pattern = re.compile("|".join(f"(?:{pattern})" for pattern in patterns)) if patterns else None
+        self.hash_routes = hash_routes
+
+    def _normalize_path(self, path: str) -> str:
+        segments = [ID_PLACEHOLDER if self._id_pattern is not None and self._id_pattern.fullmatch(segment)
+                    else segment for segment in path.split('/')]
+        return '/'.join(segments).rstrip('/')
+
+    def __call__(self, url: str) -> str:
+        """
+        Normalize a page address.
+
+        Args:
+            url: The page URL or app activity
+
+        Returns:
+            str: The partition key
+        """
+        if not url:
+            return ''
+        parts = urlsplit(url)
+        if not parts.scheme or not parts.netloc:
+            return url
+        query = urlencode(sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                                 if name in self.keep_query))
+        fragment = ''
+        if self.hash_routes and parts.fragment.startswith('/'):
+            fragment = self._normalize_path(parts.fragment.split('?', 1)[0])
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), self._normalize_path(parts.path),
+                           query, fragment))
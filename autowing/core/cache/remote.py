@@ -0,0 +1,377 @@
+"""
+Shared remote cache tier.
+
+A remote cache is a plain key-value store shared by developer machines and CI
+agents, e.g. an HTTP key-value service or Redis. Records are stored as JSON
+under ``<namespace>/entry/<key>``, and the keys of every context under
+``<namespace>/context/<context hash>`` so a page's entries are fetched together.
+"""
+import json
+import socket
+import threading
+import urllib.error
+import urllib.request
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote, urlparse
+
+from autowing.core.cache.storage import CacheStorage
+
+
+class RemoteCache(ABC):
+    """
+    Abstract base class for remote key-value stores.
+    """
+
+    @abstractmethod
+    def get(self, name: str) -> Optional[bytes]:
+        """
+        Read a value.
+
+        Args:
+            name: The key
+
+        Returns:
+            Optional[bytes]: The value, None if it doesn't exist
+        """
+        pass
+
+    def get_many(self, names: List[str]) -> List[Optional[bytes]]:
+        """
+        Read several values.
+
+        Args:
+            names: The keys
+
+        Returns:
+            List[Optional[bytes]]: The values in the same order, None for missing keys
+        """
+        return [self.get(name) for name in names]
+
+    @abstractmethod
+    def set(self, name: str, value: bytes) -> None:
+        """
+        Write a value.
+
+        Args:
+            name: The key
+            value: The value
+        """
+        pass
+
+    @abstractmethod
+    def delete(self, names: List[str]) -> None:
+        """
+        Delete values, missing keys are ignored.
+
+        Args:
+            names: The keys
+        """
+        pass
+
+    def close(self) -> None:
+        """Release connections"""
+        pass
+
+
+class MemoryRemoteCache(RemoteCache):
+    """
+    In-process stand-in for a remote cache, for tests and local experiments.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[str, bytes] = {}
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            return self._values.get(name)
+
+    def set(self, name: str, value: bytes) -> None:
+        with self._lock:
+            self._values[name] = value
+
+    def delete(self, names: List[str]) -> None:
+        with self._lock:
+            for name in names:
+                self._values.pop(name, None)
+
+
+class HttpRemoteCache(RemoteCache):
+    """
+    HTTP key-value store: GET, PUT and DELETE on ``<base_url>/<key>``,
+    404 for missing keys (e.g. a WebDAV share or a bazel-remote style cache server).
+    """
+
+    def __init__(self, base_url: str, timeout: float = 5.0, headers: Optional[Dict[str, str]] = None):
+        """
+        Initialize the HTTP remote cache.
+
+        Args:
+            base_url: URL the keys are appended to
+            timeout: Request timeout in seconds
+            headers: Extra request headers, e.g. Authorization
+        """
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+
+    def _request(self, method: str, name: str, data: Optional[bytes] = None) -> Optional[bytes]:
+        request = urllib.request.Request(f"{self.base_url}/{quote(name, safe='/')}", data=data,
+                                         method=method, headers=self.headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            raise
+
+    def get(self, name: str) -> Optional[bytes]:
+        return self._request("GET", name)
+
+    def set(self, name: str, value: bytes) -> None:
+        self._request("PUT", name, value)
+
+    def delete(self, names: List[str]) -> None:
+        for name in names:
+            self._request("DELETE", name)
+
+
+class RedisRemoteCache(RemoteCache):
+    """
+    Redis, or any server speaking the Redis protocol, through a minimal RESP client.
+    """
+
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0,
+                 password: Optional[str] = None, timeout: float = 5.0, ttl: Optional[int] = None):
+        """
+        Initialize the Redis remote cache, connecting on first use.
+
+        Args:
+            host: Server host
+            port: Server port
+            db: Database number
+            password: Password, None if authentication is disabled
+            timeout: Socket timeout in seconds
+            ttl: Expire values after ttl seconds, None to keep them
+        """
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._socket: Optional[socket.socket] = None
+        self._reader = None
+
+    def _connect(self) -> None:
+        self._socket = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._reader = self._socket.makefile('rb')
+        if self.password:
+            self._send('AUTH', self.password)
+        if self.db:
+            self._send('SELECT', self.db)
+
+    def _send(self, *args: Any) -> Any:
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            value = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+            parts.append(b"$%d\r\n%s\r\n" % (len(value), value))
+        self._socket.sendall(b''.join(parts))
+        return self._read_reply()
+
+    def _read_reply(self) -> Any:
+        line = self._reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError("Redis connection closed")
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b'+':
+            return payload.decode()
+        if prefix == b'-':
+            raise RuntimeError(f"Redis error: {payload.decode()}")
+        if prefix == b':':
+            return int(payload)
+        if prefix == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if prefix == b'*':
+            length = int(payload)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise ConnectionError(f"Unexpected Redis reply: {line[:20]!r}")
+
+    def _command(self, *args: Any) -> Any:
+        with self._lock:
+            try:
+                if self._socket is None:
+                    self._connect()
+                return self._send(*args)
+            except (OSError, ConnectionError):
+                # Reconnect on the next command
+                self._close_socket()
+                raise
+
+    def get(self, name: str) -> Optional[bytes]:
+        return self._command('GET', name)
+
+    def get_many(self, names: List[str]) -> List[Optional[bytes]]:
+        return self._command('MGET', *names) if names else []
+
+    def set(self, name: str, value: bytes) -> None:
+        if self.ttl:
+            self._command('SET', name, value, 'EX', self.ttl)
+        else:
+            self._command('SET', name, value)
+
+    def delete(self, names: List[str]) -> None:
+        if names:
+            self._command('DEL', *names)
+
+    def _close_socket(self) -> None:
+        if self._socket is not None:
+            try:
+                self._reader.close()
+                self._socket.close()
+            except OSError:
+                pass
+        self._socket = None
+        self._reader = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_socket()
+
+
+def create_remote_cache(url: str) -> RemoteCache:
+    """
+    Create a remote cache from a URL.
+
+    Args:
+        url: 'memory://' (in-process stand-in), 'http(s)://host/path' or
+             'redis://[:password@]host[:port][/db][?ttl=seconds]'
+
+    Returns:
+        RemoteCache: The remote cache
+
+    Raises:
+        ValueError: If the URL scheme is not supported
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == "memory":
+        return MemoryRemoteCache()
+    if parsed.scheme in ("http", "https"):
+        return HttpRemoteCache(url)
+    if parsed.scheme == "redis":
+        query = dict(part.split('=', 1) for part in parsed.query.split('&') if '=' in part)
+        return RedisRemoteCache(host=parsed.hostname or "localhost", port=parsed.port or 6379,
+                                db=int(parsed.path.strip('/') or 0),
+                                password=unquote(parsed.password) if parsed.password else None,
+                                ttl=int(query['ttl']) if 'ttl' in query else None)
+    raise ValueError(f"Unsupported remote cache: {url}")
+
+
+class RemoteStorage(CacheStorage):
+    """
+    Cache storage on a remote key-value store. Records are read by key or by context,
+    the store can't be listed. Access metadata is not shared.
+    """
+
+    supports_partial_load = True
+
+    def __init__(self, cache: RemoteCache, namespace: str = "autowing"):
+        """
+        Initialize the remote storage.
+
+        Args:
+            cache: The remote key-value store
+            namespace: Prefix of every key, to share a store between projects
+        """
+        self.cache = cache
+        self.namespace = namespace
+        # Serializes read-modify-write of the context indexes written by this process
+        self._index_lock = threading.Lock()
+
+    def _entry_name(self, key: str) -> str:
+        return f"{self.namespace}/entry/{key}"
+
+    def _context_name(self, context_hash: str) -> str:
+        return f"{self.namespace}/context/{context_hash}"
+
+    def _context_keys(self, context_hash: str) -> List[str]:
+        data = self.cache.get(self._context_name(context_hash))
+        return json.loads(data) if data else []
+
+    def load_all(self) -> Iterator[Dict[str, Any]]:
+        return iter(())
+
+    def load_context(self, context_hash: str) -> Iterator[Dict[str, Any]]:
+        # Reading never writes: read-only workers must not change the shared store.
+        # Keys of expired or deleted entries are skipped, and dropped by the next write
+        keys = self._context_keys(context_hash)
+        values = self.cache.get_many([self._entry_name(key) for key in keys])
+        return iter([json.loads(value) for value in values if value is not None])
+
+    def _update_index(self, context_hash: str, added: Iterable[str] = (), removed: Iterable[str] = ()) -> None:
+        """Add and remove keys of a context index, dropping the keys of expired entries"""
+        current_keys = self._context_keys(context_hash)
+        removed = set(removed)
+        existing = self.cache.get_many([self._entry_name(key) for key in current_keys])
+        keys = [key for key, value in zip(current_keys, existing) if value is not None and key not in removed]
+        keys += [key for key in dict.fromkeys(added) if key not in keys and key not in removed]
+        if keys != current_keys:
+            self.cache.set(self._context_name(context_hash), json.dumps(keys).encode())
+
+    def change_token(self) -> int:
+        return 0
+
+    def changes_since(self, token: int) -> Tuple[List[Dict[str, Any]], int]:
+        return [], token
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        data = self.cache.get(self._entry_name(key))
+        return json.loads(data) if data else None
+
+    def put(self, record: Dict[str, Any]) -> None:
+        self.put_many([record])
+
+    def put_many(self, records: Iterable[Dict[str, Any]]) -> None:
+        contexts = defaultdict(list)
+        for record in records:
+            self.cache.set(self._entry_name(record['key']),
+                           json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+            contexts[record.get('context_hash', '')].append(record['key'])
+
+        # Other machines may update an index at the same time and drop a key, the
+        # entry is then only found again once it is written anew
+        with self._index_lock:
+            for context_hash, keys in contexts.items():
+                self._update_index(context_hash, added=keys)
+
+    def delete(self, keys: Iterable[str]) -> None:
+        names = [self._entry_name(key) for key in keys]
+        if not names:
+            return
+        # The records tell which context indexes list the keys
+        contexts = defaultdict(list)
+        for value in self.cache.get_many(names):
+            if value is not None:
+                record = json.loads(value)
+                contexts[record.get('context_hash', '')].append(record['key'])
+        self.cache.delete(names)
+        with self._index_lock:
+            for context_hash, context_keys in contexts.items():
+                self._update_index(context_hash, removed=context_keys)
+
+    def update_usage(self, updates: Iterable[Tuple[str, int, str]]) -> None:
+        pass
+
+    def count(self) -> int:
+        return 0
+
+    def close(self) -> None:
+        self.cache.close()
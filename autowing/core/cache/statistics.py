@@ -0,0 +1,94 @@
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict
+
+
+@dataclass
+class CacheStatistics:
+    """
+    Cache counters, updated incrementally on every lookup and store so reading
+    them never scans the cache.
+    """
+    lookups: int = 0
+    exact_hits: int = 0
+    semantic_hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    # Entries removed because their response failed when used
+    invalidations: int = 0
+    # Sum of semantic hit similarities, for the average
+    similarity_sum: float = 0.0
+    # Seconds spent in lookups and stores
+    lookup_time: float = 0.0
+    store_time: float = 0.0
+    # LLM time and tokens the hits avoided, as recorded when the responses were computed
+    llm_time_saved: float = 0.0
+    tokens_saved: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record_lookup(self, seconds: float, hit: str = None, similarity: float = 0.0,
+                      compute_time: float = 0.0, compute_tokens: int = 0) -> None:
+        """
+        Count a lookup.
+
+        Args:
+            seconds: Lookup latency
+            hit: 'exact', 'semantic' or None for a miss
+            similarity: Similarity of a semantic hit
+            compute_time: Seconds the LLM took to compute the hit response
+            compute_tokens: Estimated tokens used to compute the hit response
+        """
+        with self._lock:
+            self.lookups += 1
+            self.lookup_time += seconds
+            if hit is None:
+                self.misses += 1
+                return
+            if hit == "exact":
+                self.exact_hits += 1
+            else:
+                self.semantic_hits += 1
+                self.similarity_sum += similarity
+            self.llm_time_saved += compute_time
+            self.tokens_saved += compute_tokens
+
+    def record_store(self, seconds: float) -> None:
+        """
+        Count a store.
+
+        Args:
+            seconds: Store latency
+        """
+        with self._lock:
+            self.stores += 1
+            self.store_time += seconds
+
+    def record_invalidation(self) -> None:
+        """Count an entry removed because its response failed"""
+        with self._lock:
+            self.invalidations += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Get the counters and the rates derived from them.
+
+        Returns:
+            Dict[str, Any]: Statistics by name
+        """
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            return {
+                "lookups": self.lookups,
+                "hits": hits,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "invalidations": self.invalidations,
+                "hit_rate": hits / self.lookups if self.lookups else 0.0,
+                "average_similarity": self.similarity_sum / self.semantic_hits if self.semantic_hits else 0.0,
+                "average_lookup_ms": self.lookup_time / self.lookups * 1000 if self.lookups else 0.0,
+                "average_store_ms": self.store_time / self.stores * 1000 if self.stores else 0.0,
+                "llm_time_saved": self.llm_time_saved,
+                "tokens_saved": self.tokens_saved,
+            }
@@ -0,0 +1,1022 @@
+"""
+Persistent storage backends for the intelligent cache.
+
+A backend stores cache records, plain dicts with at least ``key``, ``timestamp``
+(ISO format), ``prompt``, ``context_hash`` and ``response``, and is addressed by
+the record key. Records also carry the access metadata ``usage_count`` and
+``last_accessed`` (ISO format) used for eviction.
+"""
+import gzip
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.request import pathname2url
+
+from loguru import logger
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional
+    zstandard = None
+
+_GZIP_MAGIC = b'\x1f\x8b'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+class CacheStorage(ABC):
+    """
+    Abstract base class for cache storage backends.
+    """
+
+    # Whether load_context reads only the requested context instead of scanning everything
+    supports_partial_load = False
+
+    @abstractmethod
+    def load_all(self) -> Iterator[Dict[str, Any]]:
+        """
+        Load every stored record.
+
+        Returns:
+            Iterator[Dict[str, Any]]: The stored records
+        """
+        pass
+
+    def load_context(self, context_hash: str) -> Iterator[Dict[str, Any]]:
+        """
+        Load the records recorded against a context.
+
+        Args:
+            context_hash: The context hash
+
+        Returns:
+            Iterator[Dict[str, Any]]: The matching records
+        """
+        return (record for record in self.load_all() if record.get('context_hash') == context_hash)
+
+    def load_partition(self, partition: str) -> Iterator[Dict[str, Any]]:
+        """
+        Load the records of a partition (normalized page address).
+
+        Args:
+            partition: The partition key
+
+        Returns:
+            Iterator[Dict[str, Any]]: The matching records, and the records stored without
+            a partition whose page is unknown here
+        """
+        return (record for record in self.load_all() if record.get('partition', partition) == partition)
+
+    def delete_partition(self, partition: str) -> List[str]:
+        """
+        Delete the records of a partition.
+
+        Args:
+            partition: The partition key
+
+        Returns:
+            List[str]: Keys of the deleted records
+        """
+        keys = [record['key'] for record in self.load_all() if record.get('partition') == partition]
+        self.delete(keys)
+        return keys
+
+    @abstractmethod
+    def change_token(self) -> Any:
+        """
+        Get a token marking the current state of the storage.
+
+        Returns:
+            Any: Token to pass to changes_since
+        """
+        pass
+
+    @abstractmethod
+    def changes_since(self, token: Any) -> Tuple[List[Dict[str, Any]], Any]:
+        """
+        Load records written after a token was taken, including the ones
+        written by other processes sharing the storage.
+
+        Args:
+            token: Token from change_token or a previous changes_since call
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Any]: The changed records and the new token
+        """
+        pass
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a single record.
+
+        Args:
+            key: The cache key
+
+        Returns:
+            Optional[Dict[str, Any]]: The record, None if it doesn't exist
+        """
+        pass
+
+    @abstractmethod
+    def put(self, record: Dict[str, Any]) -> None:
+        """
+        Insert or replace a record.
+
+        Args:
+            record: The record to store, identified by record['key']
+        """
+        pass
+
+    @abstractmethod
+    def delete(self, keys: Iterable[str]) -> None:
+        """
+        Delete records.
+
+        Args:
+            keys: Keys of the records to delete, missing keys are ignored
+        """
+        pass
+
+    @abstractmethod
+    def count(self) -> int:
+        """
+        Get the number of stored records.
+
+        Returns:
+            int: Number of records
+        """
+        pass
+
+    def put_many(self, records: Iterable[Dict[str, Any]]) -> None:
+        """
+        Insert or replace several records.
+
+        Args:
+            records: The records to store
+        """
+        for record in records:
+            self.put(record)
+
+    @abstractmethod
+    def update_usage(self, updates: Iterable[Tuple[str, int, str]]) -> None:
+        """
+        Persist access metadata.
+
+        Args:
+            updates: (key, usage count increment, last access time in ISO format) tuples
+        """
+        pass
+
+    def stats(self) -> Tuple[int, int]:
+        """
+        Get the number of records and their total serialized size.
+
+        Returns:
+            Tuple[int, int]: Record count and size in bytes
+        """
+        sizes = [record_size(record) for record in self.load_all()]
+        return len(sizes), sum(sizes)
+
+    def eviction_candidates(self, policy: str) -> Iterator[Tuple[str, int]]:
+        """
+        List records in eviction order.
+
+        Args:
+            policy: 'lru' (least recently used first) or 'lfu' (least frequently used first,
+                    least recently used among equals)
+
+        Returns:
+            Iterator[Tuple[str, int]]: (key, size in bytes) tuples, first to evict first
+        """
+        records = list(self.load_all())
+        records.sort(key=lambda record: _eviction_sort_key(policy, record.get('usage_count', 1),
+                                                           last_accessed(record)))
+        return ((record['key'], record_size(record)) for record in records)
+
+    def expired_keys(self, cutoff: str) -> List[str]:
+        """
+        Get the keys of records created before a point in time.
+
+        Args:
+            cutoff: Point in time in ISO format
+
+        Returns:
+            List[str]: Keys of the expired records
+        """
+        return [record['key'] for record in self.load_all() if record['timestamp'] < cutoff]
+
+    def fetch_context(self, context_hash: str) -> List[Dict[str, Any]]:
+        """
+        Fetch the records of a context from a shared tier behind this storage,
+        keeping a copy. Storages without such a tier have nothing to fetch.
+
+        Args:
+            context_hash: The context hash
+
+        Returns:
+            List[Dict[str, Any]]: The fetched records missing or outdated in this storage
+        """
+        return []
+
+    def compact(self) -> None:
+        """Reclaim space left by deleted or replaced records"""
+        pass
+
+    def flush(self) -> None:
+        """Apply buffered writes"""
+        pass
+
+    def close(self) -> None:
+        """Release resources held by the backend"""
+        pass
+
+
+class JsonDirStorage(CacheStorage):
+    """
+    One ``<key>.json`` file per record, the original auto-wing cache layout.
+    Kept for compatibility and as a human-readable export format.
+
+    Files are written to a temporary file and renamed into place, so concurrent
+    readers never see a half-written record.
+    """
+
+    # Unparseable files younger than this may still be written by another process
+    invalid_file_grace_seconds = 60
+
+    def __init__(self, cache_dir: str, read_only: bool = False):
+        """
+        Initialize the JSON directory storage.
+
+        Args:
+            cache_dir: Directory holding the cache files
+            read_only: Only read the directory, invalid files are left in place
+        """
+        self.cache_dir = cache_dir
+        self.read_only = read_only
+        if not read_only:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read(self, filepath: str, key: str) -> Optional[Dict[str, Any]]:
+        """Read a cache file, removing it if it is invalid"""
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+            if not isinstance(record, dict) or 'timestamp' not in record:
+                raise ValueError(f"Invalid cache record: {filepath}")
+        except FileNotFoundError:
+            # Deleted by another process in the meantime
+            return None
+        except (json.JSONDecodeError, ValueError):
+            # Remove invalid cache files, unless they may still be in flight
+            try:
+                if (not self.read_only and
+                        time.time() - os.path.getmtime(filepath) > self.invalid_file_grace_seconds):
+                    os.remove(filepath)
+            except OSError:
+                pass
+            return None
+        record['key'] = key
+        return record
+
+    def load_all(self) -> Iterator[Dict[str, Any]]:
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith('.json'):
+                continue
+            record = self._read(os.path.join(self.cache_dir, filename), filename[:-len('.json')])
+            if record is not None:
+                yield record
+
+    def change_token(self) -> float:
+        return time.time()
+
+    def changes_since(self, token: float) -> Tuple[List[Dict[str, Any]], float]:
+        new_token = time.time()
+        records = []
+        with os.scandir(self.cache_dir) as it:
+            for item in it:
+                if not item.name.endswith('.json'):
+                    continue
+                try:
+                    if item.stat().st_mtime < token:
+                        continue
+                except FileNotFoundError:
+                    continue
+                record = self._read(item.path, item.name[:-len('.json')])
+                if record is not None:
+                    records.append(record)
+        return records, new_token
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        filepath = self._path(key)
+        if not os.path.exists(filepath):
+            return None
+        return self._read(filepath, key)
+
+    def put(self, record: Dict[str, Any]) -> None:
+        data = {k: v for k, v in record.items() if k != 'key'}
+        # Write to a temporary file (ignored by readers) and atomically rename it into place
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self._path(record['key']))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def delete(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def update_usage(self, updates: Iterable[Tuple[str, int, str]]) -> None:
+        for key, usage_increment, accessed in updates:
+            record = self.get(key)
+            if record is None:
+                continue
+            record['usage_count'] = record.get('usage_count', 1) + usage_increment
+            record['last_accessed'] = max(last_accessed(record), accessed)
+            self.put(record)
+
+    def count(self) -> int:
+        return sum(1 for filename in os.listdir(self.cache_dir) if filename.endswith('.json'))
+
+    def stats(self) -> Tuple[int, int]:
+        count = size = 0
+        with os.scandir(self.cache_dir) as it:
+            for item in it:
+                if item.name.endswith('.json'):
+                    try:
+                        size += item.stat().st_size
+                        count += 1
+                    except FileNotFoundError:
+                        continue
+        return count, size
+
+
+class SQLiteStorage(CacheStorage):
+    """
+    All records in a single SQLite file, indexed by key, context hash and partition.
+
+    SQLite's own file locking makes the store safe to share between processes,
+    and every write gets a new, never reused ``id`` so other processes can pick
+    up changes incrementally.
+    """
+
+    supports_partial_load = True
+
+    # Seconds to wait for a lock held by another process
+    busy_timeout = 30
+
+    # Record fields stored in their own columns rather than in the data blob
+    _columns = ('key', 'usage_count', 'last_accessed')
+
+    def __init__(self, db_path: str, compression: Optional[str] = None, read_only: bool = False):
+        """
+        Initialize the SQLite storage.
+
+        Args:
+            db_path: Path of the database file
+            compression: Compress written records with 'gzip' or 'zstd' (requires the zstandard
+                         package), None stores plain JSON. Records are readable whatever the setting
+            read_only: Open an existing database in read-only mode
+        """
+        if compression not in (None, "gzip", "zstd"):
+            raise ValueError(f"Unsupported compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("zstd compression requires the zstandard package: pip install zstandard")
+        self.db_path = db_path
+        self.compression = compression
+        self._lock = threading.Lock()
+        if read_only:
+            uri = f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True, timeout=self.busy_timeout, check_same_thread=False)
+            self._partitioned = self._has_partition_column()
+            return
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=self.busy_timeout, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    key TEXT NOT NULL UNIQUE,
+                    context_hash TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    usage_count INTEGER NOT NULL DEFAULT 1,
+                    last_accessed TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    partition TEXT NOT NULL DEFAULT ''
+                )
+            """)
+            if not self._has_partition_column():
+                # Stores created before partitions, their records are in the '' partition
+                self._conn.execute("ALTER TABLE cache_entries ADD COLUMN partition TEXT NOT NULL DEFAULT ''")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_cache_entries_context ON cache_entries (context_hash)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_cache_entries_partition ON cache_entries (partition)"
+            )
+        self._partitioned = True
+
+    def _has_partition_column(self) -> bool:
+        return any(row[1] == 'partition' for row in self._conn.execute("PRAGMA table_info(cache_entries)"))
+
+    def _encode(self, record: Dict[str, Any]) -> tuple:
+        data = json.dumps({k: v for k, v in record.items() if k not in self._columns},
+                          ensure_ascii=False, separators=(',', ':'))
+        if self.compression == "gzip":
+            data = gzip.compress(data.encode('utf-8'))
+        elif self.compression == "zstd":
+            data = zstandard.ZstdCompressor().compress(data.encode('utf-8'))
+        size = len(data) if isinstance(data, bytes) else len(data.encode('utf-8'))
+        return (record['key'], record.get('context_hash', ''), record['timestamp'],
+                record.get('usage_count', 1), last_accessed(record), size, data, record.get('partition', ''))
+
+    @staticmethod
+    def _decode(key: str, data, usage_count: int, accessed: str) -> Optional[Dict[str, Any]]:
+        try:
+            if isinstance(data, bytes):
+                # Compressed records are recognized by their magic number
+                if data.startswith(_GZIP_MAGIC):
+                    data = gzip.decompress(data)
+                elif data.startswith(_ZSTD_MAGIC):
+                    if zstandard is None:
+                        raise ImportError("zstandard package is required to read zstd compressed cache records")
+                    data = zstandard.ZstdDecompressor().decompress(data)
+                data = data.decode('utf-8')
+            record = json.loads(data)
+        except (OSError, ValueError):
+            return None
+        record.update(key=key, usage_count=usage_count, last_accessed=accessed)
+        return record
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _load(self, where: str = "", params: tuple = ()) -> Iterator[Dict[str, Any]]:
+        rows = self._query(f"SELECT key, data, usage_count, last_accessed FROM cache_entries {where}", params)
+        for row in rows:
+            record = self._decode(*row)
+            if record is not None:
+                yield record
+
+    def load_all(self) -> Iterator[Dict[str, Any]]:
+        return self._load()
+
+    def load_context(self, context_hash: str) -> Iterator[Dict[str, Any]]:
+        return self._load("WHERE context_hash = ?", (context_hash,))
+
+    def load_partition(self, partition: str) -> Iterator[Dict[str, Any]]:
+        if not self._partitioned:
+            return super().load_partition(partition)
+        return self._load("WHERE partition = ?", (partition,))
+
+    def delete_partition(self, partition: str) -> List[str]:
+        with self._lock, self._conn:
+            keys = [key for key, in self._conn.execute("SELECT key FROM cache_entries WHERE partition = ?",
+                                                       (partition,))]
+            self._conn.execute("DELETE FROM cache_entries WHERE partition = ?", (partition,))
+        return keys
+
+    def change_token(self) -> int:
+        return self._query("SELECT COALESCE(MAX(id), 0) FROM cache_entries")[0][0]
+
+    def changes_since(self, token: int) -> Tuple[List[Dict[str, Any]], int]:
+        rows = self._query(
+            "SELECT id, key, data, usage_count, last_accessed FROM cache_entries WHERE id > ? ORDER BY id",
+            (token,)
+        )
+        records = [record for record in (self._decode(*row[1:]) for row in rows) if record is not None]
+        return records, (rows[-1][0] if rows else token)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return next(self._load("WHERE key = ?", (key,)), None)
+
+    def put(self, record: Dict[str, Any]) -> None:
+        self.put_many([record])
+
+    def put_many(self, records: Iterable[Dict[str, Any]]) -> None:
+        rows = [self._encode(record) for record in records]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cache_entries "
+                "(key, context_hash, timestamp, usage_count, last_accessed, size, data, partition) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def delete(self, keys: Iterable[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM cache_entries WHERE key = ?", [(key,) for key in keys])
+
+    def update_usage(self, updates: Iterable[Tuple[str, int, str]]) -> None:
+        # Increments add up when several processes update the same entry
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE cache_entries SET usage_count = usage_count + ?, "
+                "last_accessed = MAX(last_accessed, ?) WHERE key = ?",
+                [(usage_increment, accessed, key) for key, usage_increment, accessed in updates]
+            )
+
+    def count(self) -> int:
+        return self._query("SELECT COUNT(*) FROM cache_entries")[0][0]
+
+    def stats(self) -> Tuple[int, int]:
+        count, size = self._query("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries")[0]
+        return count, size
+
+    def eviction_candidates(self, policy: str) -> Iterator[Tuple[str, int]]:
+        order = "usage_count, last_accessed" if policy == "lfu" else "last_accessed"
+        return iter(self._query(f"SELECT key, size FROM cache_entries ORDER BY {order}"))
+
+    def expired_keys(self, cutoff: str) -> List[str]:
+        return [key for key, in self._query("SELECT key FROM cache_entries WHERE timestamp < ?", (cutoff,))]
+
+    def compact(self) -> None:
+        with self._lock:
+            self._conn.execute("VACUUM")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class MemoryStorage(CacheStorage):
+    """
+    Records kept in a dict, nothing is persisted.
+    """
+
+    def __init__(self):
+        """Initialize an empty memory storage."""
+        self._lock = threading.Lock()
+        # key -> (write sequence number, record)
+        self._records: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        self._sequence = 0
+
+    def load_all(self) -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            return iter([dict(record) for _, record in self._records.values()])
+
+    def change_token(self) -> int:
+        return self._sequence
+
+    def changes_since(self, token: int) -> Tuple[List[Dict[str, Any]], int]:
+        with self._lock:
+            changed = sorted((item for item in self._records.values() if item[0] > token), key=lambda item: item[0])
+            return [dict(record) for _, record in changed], self._sequence
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._records.get(key)
+            return dict(item[1]) if item is not None else None
+
+    def put(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._sequence += 1
+            self._records[record['key']] = (self._sequence, dict(record))
+
+    def delete(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._records.pop(key, None)
+
+    def update_usage(self, updates: Iterable[Tuple[str, int, str]]) -> None:
+        with self._lock:
+            for key, usage_increment, accessed in updates:
+                item = self._records.get(key)
+                if item is None:
+                    continue
+                record = item[1]
+                record['usage_count'] = record.get('usage_count', 1) + usage_increment
+                record['last_accessed'] = max(last_accessed(record), accessed)
+
+    def count(self) -> int:
+        return len(self._records)
+
+
+class ReadOnlyStorage(CacheStorage):
+    """
+    Read-only view of another backend: reads are delegated, writes are dropped.
+    """
+
+    def __init__(self, storage: CacheStorage):
+        """
+        Initialize the read-only view.
+
+        Args:
+            storage: The backend to read from
+        """
+        self.storage = storage
+        self.supports_partial_load = storage.supports_partial_load
+
+    def load_all(self) -> Iterator[Dict[str, Any]]:
+        return self.storage.load_all()
+
+    def load_context(self, context_hash: str) -> Iterator[Dict[str, Any]]:
+        return self.storage.load_context(context_hash)
+
+    def load_partition(self, partition: str) -> Iterator[Dict[str, Any]]:
+        return self.storage.load_partition(partition)
+
+    def delete_partition(self, partition: str) -> List[str]:
+        return []
+
+    def change_token(self) -> Any:
+        return self.storage.change_token()
+
+    def changes_since(self, token: Any) -> Tuple[List[Dict[str, Any]], Any]:
+        return self.storage.changes_since(token)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.storage.get(key)
+
+    def put(self, record: Dict[str, Any]) -> None:
+        pass
+
+    def put_many(self, records: Iterable[Dict[str, Any]]) -> None:
+        pass
+
+    def delete(self, keys: Iterable[str]) -> None:
+        pass
+
+    def update_usage(self, updates: Iterable[Tuple[str, int, str]]) -> None:
+        pass
+
+    def count(self) -> int:
+        return self.storage.count()
+
+    def stats(self) -> Tuple[int, int]:
+        return self.storage.stats()
+
+    def eviction_candidates(self, policy: str) -> Iterator[Tuple[str, int]]:
+        return self.storage.eviction_candidates(policy)
+
+    def expired_keys(self, cutoff: str) -> List[str]:
+        return self.storage.expired_keys(cutoff)
+
+    def close(self) -> None:
+        self.storage.close()
+
+
+class WriteBehindStorage(CacheStorage):
+    """
+    Write-behind view of another backend: writes are queued and applied in batches
+    by a background thread, so storing an entry never waits for the disk.
+
+    Reads see the queued writes. Queued writes are lost if the process is killed
+    before they are flushed, at most flush_interval seconds of them.
+    """
+
+    def __init__(self, storage: CacheStorage, flush_interval: float = 0.5, max_pending: int = 1000):
+        """
+        Initialize the write-behind view and start its writer thread.
+
+        Args:
+            storage: The backend to write into
+            flush_interval: Seconds writes are collected before being applied in one batch,
+                            0 applies them as soon as the writer thread is free
+            max_pending: Maximum number of queued writes, writers wait for the queue to drain beyond it
+        """
+        self.storage = storage
+        self.supports_partial_load = storage.supports_partial_load
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        # Queued operations in order: ('put', record), ('delete', keys) or ('usage', updates)
+        self._operations: List[Tuple[str, Any]] = []
+        # key -> latest queued record, None if its latest queued write is a delete
+        self._pending: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._condition = threading.Condition()
+        # Keeps batches in order when the writer thread and flush() run together
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="autowing-cache-writer", daemon=True)
+        self._thread.start()
+
+    def _enqueue(self, operation: str, payload: Any) -> None:
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Write-behind storage is closed")
+            while len(self._operations) >= self.max_pending:
+                # Back pressure, the writer thread flushes a full queue right away
+                self._condition.notify_all()
+                self._condition.wait()
+            self._operations.append((operation, payload))
+            if operation == 'put':
+                self._pending[payload['key']] = payload
+            elif operation == 'delete':
+                for key in payload:
+                    self._pending[key] = None
+            self._condition.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._operations or self._closed)
+                if self._closed:
+                    return
+                # Collect more writes into the batch, unless the queue is full
+                self._condition.wait_for(lambda: self._closed or len(self._operations) >= self.max_pending,
+                                         timeout=self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to write cache entries: {e}")
+
+    def flush(self) -> int:
+        """
+        Apply the queued writes now.
+
+        Returns:
+            int: Number of applied operations
+        """
+        with self._write_lock:
+            with self._condition:
+                operations, self._operations = self._operations, []
+                self._condition.notify_all()
+            if not operations:
+                return 0
+
+            try:
+                puts = []
+                for operation, payload in operations:
+                    if operation == 'put':
+                        puts.append(payload)
+                        continue
+                    # Consecutive puts are written in one batch, in order with the other writes
+                    if puts:
+                        self.storage.put_many(puts)
+                        puts = []
+                    if operation == 'delete':
+                        self.storage.delete(payload)
+                    else:
+                        self.storage.update_usage(payload)
+                if puts:
+                    self.storage.put_many(puts)
+            finally:
+                with self._condition:
+                    # Forget the applied writes, unless a key was written again since
+                    for operation, payload in operations:
+                        if operation == 'put':
+                            if self._pending.get(payload['key']) is payload:
+                                del self._pending[payload['key']]
+                        elif operation == 'delete':
+                            for key in payload:
+                                if key in self._pending and self._pending[key] is None:
+                                    del self._pending[key]
+        return len(operations)
+
+    def _with_pending(self, records: Iterable[Dict[str, Any]], field: Optional[str] = None,
+                      value: str = '') -> Iterator[Dict[str, Any]]:
+        """Stored records overlaid with the queued writes whose field has the value"""
+        records = list(records)
+        with self._condition:
+            pending = dict(self._pending)
+        for record in records:
+            if record['key'] not in pending:
+                yield record
+        for record in pending.values():
+            if record is not None and (field is None or record.get(field, '') == value):
+                yield record
+
+    def load_all(self) -> Iterator[Dict[str, Any]]:
+        return self._with_pending(self.storage.load_all())
+
+    def load_context(self, context_hash: str) -> Iterator[Dict[str, Any]]:
+        return self._with_pending(self.storage.load_context(context_hash), 'context_hash', context_hash)
+
+    def load_partition(self, partition: str) -> Iterator[Dict[str, Any]]:
+        return self._with_pending(self.storage.load_partition(partition), 'partition', partition)
+
+    def delete_partition(self, partition: str) -> List[str]:
+        self.flush()
+        return self.storage.delete_partition(partition)
+
+    def change_token(self) -> Any:
+        return self.storage.change_token()
+
+    def changes_since(self, token: Any) -> Tuple[List[Dict[str, Any]], Any]:
+        return self.storage.changes_since(token)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._condition:
+            if key in self._pending:
+                return self._pending[key]
+        return self.storage.get(key)
+
+    def put(self, record: Dict[str, Any]) -> None:
+        self._enqueue('put', record)
+
+    def put_many(self, records: Iterable[Dict[str, Any]]) -> None:
+        for record in records:
+            self._enqueue('put', record)
+
+    def delete(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        if keys:
+            self._enqueue('delete', keys)
+
+    def update_usage(self, updates: Iterable[Tuple[str, int, str]]) -> None:
+        updates = list(updates)
+        if updates:
+            self._enqueue('usage', updates)
+
+    def count(self) -> int:
+        self.flush()
+        return self.storage.count()
+
+    def stats(self) -> Tuple[int, int]:
+        self.flush()
+        return self.storage.stats()
+
+    def eviction_candidates(self, policy: str) -> Iterator[Tuple[str, int]]:
+        self.flush()
+        return self.storage.eviction_candidates(policy)
+
+    def expired_keys(self, cutoff: str) -> List[str]:
+        self.flush()
+        return self.storage.expired_keys(cutoff)
+
+    def compact(self) -> None:
+        self.flush()
+        self.storage.compact()
+
+    def close(self) -> None:
+        """Stop the writer thread, apply the queued writes and close the backend"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        try:
+            self.flush()
+        finally:
+            self.storage.close()
+
+
+class TieredStorage(CacheStorage):
+    """
+    Local storage backed by a shared, slower one (e.g. a remote cache). Lookups use the
+    local tier, fetch_context and get promote shared records into it. Writes go to both
+    tiers, deletes (eviction, expiry, invalidation) only to the local one: a recomputed
+    entry replaces the shared one when it is written. Failures of the shared tier are
+    logged, they never fail the caller.
+    """
+
+    def __init__(self, local: CacheStorage, shared: CacheStorage):
+        """
+        Initialize the tiered storage.
+
+        Args:
+            local: The local tier
+            shared: The shared tier, usually wrapped in a WriteBehindStorage so writes
+                    propagate in the background
+        """
+        self.local = local
+        self.shared = shared
+        self.supports_partial_load = local.supports_partial_load
+
+    def load_all(self) -> Iterator[Dict[str, Any]]:
+        return self.local.load_all()
+
+    def load_context(self, context_hash: str) -> Iterator[Dict[str, Any]]:
+        return self.local.load_context(context_hash)
+
+    def load_partition(self, partition: str) -> Iterator[Dict[str, Any]]:
+        return self.local.load_partition(partition)
+
+    def delete_partition(self, partition: str) -> List[str]:
+        return self.local.delete_partition(partition)
+
+    def fetch_context(self, context_hash: str) -> List[Dict[str, Any]]:
+        try:
+            shared_records = list(self.shared.load_context(context_hash))
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to read the shared cache: {e}")
+            return []
+        if not shared_records:
+            return []
+
+        local_timestamps = {record['key']: record['timestamp'] for record in self.local.load_context(context_hash)}
+        promoted = [self._promoted(record) for record in shared_records
+                    if record.get('timestamp', '') > local_timestamps.get(record['key'], '')]
+        self.local.put_many(promoted)
+        return promoted
+
+    @staticmethod
+    def _promoted(record: Dict[str, Any]) -> Dict[str, Any]:
+        # Usage is counted per machine
+        return {**record, 'usage_count': 1, 'last_accessed': None}
+
+    def change_token(self) -> Any:
+        return self.local.change_token()
+
+    def changes_since(self, token: Any) -> Tuple[List[Dict[str, Any]], Any]:
+        return self.local.changes_since(token)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        record = self.local.get(key)
+        if record is not None:
+            return record
+        try:
+            record = self.shared.get(key)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to read the shared cache: {e}")
+            return None
+        if record is not None:
+            record = self._promoted(record)
+            self.local.put(record)
+        return record
+
+    def _write_shared(self, method: str, *args: Any) -> None:
+        try:
+            getattr(self.shared, method)(*args)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to write the shared cache: {e}")
+
+    def put(self, record: Dict[str, Any]) -> None:
+        self.local.put(record)
+        self._write_shared('put', record)
+
+    def put_many(self, records: Iterable[Dict[str, Any]]) -> None:
+        records = list(records)
+        self.local.put_many(records)
+        self._write_shared('put_many', records)
+
+    def delete(self, keys: Iterable[str]) -> None:
+        self.local.delete(keys)
+
+    def update_usage(self, updates: Iterable[Tuple[str, int, str]]) -> None:
+        self.local.update_usage(updates)
+
+    def count(self) -> int:
+        return self.local.count()
+
+    def stats(self) -> Tuple[int, int]:
+        return self.local.stats()
+
+    def eviction_candidates(self, policy: str) -> Iterator[Tuple[str, int]]:
+        return self.local.eviction_candidates(policy)
+
+    def expired_keys(self, cutoff: str) -> List[str]:
+        return self.local.expired_keys(cutoff)
+
+    def compact(self) -> None:
+        self.local.compact()
+
+    def flush(self) -> None:
+        self.local.flush()
+        self._write_shared('flush')
+
+    def close(self) -> None:
+        self.local.close()
+        self._write_shared('close')
+
+
+def copy_records(source: CacheStorage, target: CacheStorage) -> int:
+    """
+    Copy every record of a storage into another one, e.g. to migrate a JSON
+    cache directory into SQLite or to export SQLite records as JSON files.
+
+    Args:
+        source: The storage to read from
+        target: The storage to write into
+
+    Returns:
+        int: Number of copied records
+    """
+    records = list(source.load_all())
+    target.put_many(records)
+    logger.debug(f"📦 Copied {len(records)} cache records")
+    return len(records)
+
+
+def last_accessed(record: Dict[str, Any]) -> str:
+    """Last access time of a record in ISO format, its creation time if it was never accessed"""
+    return record.get('last_accessed') or record['timestamp']
+
+
+def record_size(record: Dict[str, Any]) -> int:
+    """Approximate serialized size of a record in bytes"""
+    return len(json.dumps(record, ensure_ascii=False).encode('utf-8'))
+
+
+def _eviction_sort_key(policy: str, usage_count: int, accessed: str) -> tuple:
+    if policy == "lfu":
+        return usage_count, accessed
+    return (accessed,)
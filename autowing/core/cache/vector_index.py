@@ -0,0 +1,184 @@
+import math
+from collections import defaultdict
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, fall back to a sparse pure Python index
+    np = None
+
+
+class VectorIndex:
+    """
+    Matrix of L2-normalized prompt vectors.
+
+    A query is scored against every row in one batched operation: a single
+    matrix-vector product when numpy is available, otherwise an accumulation
+    over an inverted index of the non-zero features. A few candidate rows are
+    scored on their own: numpy rows, or the sparse row vectors.
+    """
+
+    def __init__(self, use_numpy: Optional[bool] = None):
+        """
+        Initialize an empty index.
+
+        Args:
+            use_numpy: Force (True) or disable (False) the numpy backend,
+                       None uses numpy when it is installed
+        """
+        if use_numpy and np is None:
+            raise ImportError("numpy is required for the numpy vector index backend")
+        self.use_numpy = np is not None if use_numpy is None else use_numpy
+        self.dim = 0
+        self._size = 0
+        self._matrix = None
+        self._postings = defaultdict(list)
+        # Sparse rows (feature -> value) of the pure Python backend
+        self._rows: List[dict] = []
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> List[float]:
+        """Return the L2-normalized copy of a vector"""
+        norm = math.sqrt(sum(v * v for v in vector))
+        if norm == 0:
+            return list(vector)
+        return [v / norm for v in vector]
+
+    def clear(self) -> None:
+        """Remove all rows"""
+        self.dim = 0
+        self._size = 0
+        self._matrix = None
+        self._postings = defaultdict(list)
+        self._rows = []
+
+    def rebuild(self, vectors: Sequence[Sequence[float]]) -> None:
+        """
+        Replace the index content.
+
+        Args:
+            vectors: Row vectors, all with the same dimension
+        """
+        self.clear()
+        for vector in vectors:
+            self.add(vector)
+
+    def retain(self, rows: Sequence[int]) -> None:
+        """
+        Keep only the given rows, renumbered in the given order.
+
+        Args:
+            rows: Row numbers to keep
+        """
+        if self.use_numpy:
+            if self._matrix is not None:
+                self._matrix = self._matrix[list(rows)] if rows else None
+        else:
+            new_rows = {row: new_row for new_row, row in enumerate(rows)}
+            postings = defaultdict(list)
+            for idx, entries in self._postings.items():
+                kept = [(new_rows[row], value) for row, value in entries if row in new_rows]
+                if kept:
+                    postings[idx] = sorted(kept)
+            self._postings = postings
+            self._rows = [self._rows[row] for row in rows]
+        self._size = len(rows)
+        if self._size == 0:
+            self.clear()
+
+    def add(self, vector: Sequence[float]) -> int:
+        """
+        Append a vector.
+
+        Args:
+            vector: The vector to add
+
+        Returns:
+            int: The row number of the added vector
+        """
+        if self._size == 0:
+            self.dim = len(vector)
+        elif len(vector) != self.dim:
+            raise ValueError(f"Vector dimension {len(vector)} does not match index dimension {self.dim}")
+
+        row = self._size
+        normalized = self._normalize(vector)
+        if self.use_numpy:
+            if self._matrix is None:
+                self._matrix = np.zeros((16, self.dim), dtype=np.float32)
+            elif row >= self._matrix.shape[0]:
+                # Grow geometrically so appends stay amortized O(1)
+                grown = np.zeros((self._matrix.shape[0] * 2, self.dim), dtype=np.float32)
+                grown[:row] = self._matrix[:row]
+                self._matrix = grown
+            self._matrix[row] = normalized
+        else:
+            sparse = {idx: value for idx, value in enumerate(normalized) if value}
+            for idx, value in sparse.items():
+                self._postings[idx].append((row, value))
+            self._rows.append(sparse)
+
+        self._size += 1
+        return row
+
+    def scores(self, vector: Sequence[float]) -> List[float]:
+        """
+        Cosine similarity of a query against every row.
+
+        Args:
+            vector: The query vector (normalization is applied here)
+
+        Returns:
+            List[float]: One score per row, in row order
+        """
+        if self._size == 0 or len(vector) != self.dim:
+            return [0.0] * self._size
+
+        query = self._normalize(vector)
+        if self.use_numpy:
+            return (self._matrix[:self._size] @ np.asarray(query, dtype=np.float32)).tolist()
+
+        scores = [0.0] * self._size
+        for idx, q_value in enumerate(query):
+            if not q_value:
+                continue
+            for row, value in self._postings.get(idx, ()):
+                scores[row] += q_value * value
+        return scores
+
+    def best(self, vector: Sequence[float], rows: Optional[Sequence[int]] = None) -> Tuple[int, float]:
+        """
+        Find the most similar row.
+
+        Args:
+            vector: The query vector
+            rows: Only consider these rows, None considers all rows
+
+        Returns:
+            Tuple[int, float]: Best row and its score, (-1, 0.0) if there is no candidate
+        """
+        if rows is not None:
+            # Only score the candidate rows
+            if not rows or self._size == 0 or len(vector) != self.dim:
+                return -1, 0.0
+            candidates = list(rows)
+            query = self._normalize(vector)
+            if self.use_numpy:
+                scores = (self._matrix[candidates] @ np.asarray(query, dtype=np.float32)).tolist()
+            else:
+                query = {idx: value for idx, value in enumerate(query) if value}
+                scores = [sum(value * query.get(idx, 0.0) for idx, value in self._rows[row].items())
+                          for row in candidates]
+            best = max(range(len(candidates)), key=scores.__getitem__)
+            return (candidates[best], scores[best]) if scores[best] > 0 else (-1, 0.0)
+
+        scores = self.scores(vector)
+        candidates = range(len(scores)) if rows is None else rows
+        best_row, best_score = -1, 0.0
+        for row in candidates:
+            if scores[row] > best_score:
+                best_row, best_score = row, scores[row]
+        return best_row, best_score
@@ -0,0 +1,218 @@
+"""
+Prompt aware ranking of page elements.
+
+Big pages have thousands of interactive elements, sending all of them to the LLM
+is slow and expensive. Elements are scored against the prompt with BM25 over the
+fields naming them (text, aria label, placeholder, name, id), and only the best
+ones are sent, with a few structural anchors (search boxes, submit buttons).
+When the LLM can't act on that slice, it is widened a few times.
+"""
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence
+
+from autowing.core.cache.cache_manager import ImprovedTFIDFVectorizer
+
+# Element field -> weight of its terms
+DEFAULT_FIELD_WEIGHTS = {
+    'text': 1.0,
+    'aria': 1.5,
+    'placeholder': 1.5,
+    'name': 1.0,
+    'id': 1.0,
+    'value': 0.5,
+    'type': 0.5,
+    'tag': 0.5,
+}
+
+# Longest field value scored, long texts are containers rather than targets
+_MAX_FIELD_LENGTH = 200
+# camelCase boundaries, split like underscores and dashes already are
+_CAMEL_CASE_PATTERN = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+class ElementRanker:
+    """
+    Ranks page elements by BM25 relevance to a prompt.
+    """
+
+    def __init__(self, field_weights: Optional[Dict[str, float]] = None, k1: float = 1.2, b: float = 0.75,
+                 max_anchors: int = 10):
+        """
+        Initialize the ranker.
+
+        Args:
+            field_weights: Element field -> weight, defaults to DEFAULT_FIELD_WEIGHTS
+            k1: BM25 term frequency saturation
+            b: BM25 length normalization
+            max_anchors: Most structural anchors added to a selection
+        """
+        self.field_weights = dict(DEFAULT_FIELD_WEIGHTS if field_weights is None else field_weights)
+        self.k1 = k1
+        self.b = b
+        self.max_anchors = max_anchors
+        # Same tokens as the cache prompt vectors: words, Chinese characters and their bigrams.
+        # Field values are memoized per call, they would only churn the vectorizer's memo
+        self._vectorizer = ImprovedTFIDFVectorizer()
+        self._vectorizer.ngram_cache_size = 0
+
+    def _terms(self, text: str) -> tuple:
+        return self._vectorizer._text_ngrams(_CAMEL_CASE_PATTERN.sub(' ', text[:_MAX_FIELD_LENGTH]))
+
+    def _element_terms(self, element: Dict[str, Any], query: set, memo: Dict[str, tuple]) -> tuple:
+        """Weighted number of terms of an element, and weighted frequencies of the query terms in it"""
+        length = 0.0
+        frequencies = {}
+        for field, value in element.items():
+            weight = self.field_weights.get(field)
+            if not weight or value in (None, '') or isinstance(value, (dict, list)):
+                continue
+            value = str(value)
+            counted = memo.get(value)
+            if counted is None:
+                terms = self._terms(value)
+                counted = memo[value] = (len(terms), [term for term in terms if term in query])
+            length += weight * counted[0]
+            for term in counted[1]:
+                frequencies[term] = frequencies.get(term, 0.0) + weight
+        return length, frequencies
+
+    def scores(self, prompt: str, elements: Sequence[Dict[str, Any]]) -> List[float]:
+        """
+        BM25 score of every element for a prompt.
+
+        Args:
+            prompt: The prompt
+            elements: Element information from the page context
+
+        Returns:
+            List[float]: One score per element, 0.0 when no prompt term matches
+        """
+        query = set(self._terms(prompt))
+        if not elements or not query:
+            return [0.0] * len(elements)
+
+        memo = {}
+        documents = [self._element_terms(element, query, memo) if isinstance(element, dict) else (0.0, {})
+                     for element in elements]
+        average_length = sum(length for length, _ in documents) / len(documents) or 1.0
+        doc_freq = Counter(term for _, frequencies in documents for term in frequencies)
+        idf = {term: math.log(1 + (len(documents) - freq + 0.5) / (freq + 0.5)) for term, freq in doc_freq.items()}
+
+        scores = []
+        for length, frequencies in documents:
+            score = 0.0
+            if frequencies:
+                norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                for term, tf in frequencies.items():
+                    score += idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            scores.append(score)
+        return scores
+
+    def rank(self, prompt: str, elements: Sequence[Dict[str, Any]]) -> List[int]:
+        """
+        Element indexes, most relevant first. Ties keep the visible elements first
+        (see the viewport flags), then the document order.
+
+        Args:
+            prompt: The prompt
+            elements: Element information from the page context
+
+        Returns:
+            List[int]: Indexes into elements
+        """
+        scores = self.scores(prompt, elements)
+
+        def hidden(index: int) -> bool:
+            element = elements[index]
+            return isinstance(element, dict) and bool(element.get('offscreen') or element.get('occluded'))
+
+        return sorted(range(len(elements)), key=lambda index: (-scores[index], hidden(index), index))
+
+    def anchors(self, elements: Sequence[Dict[str, Any]]) -> List[int]:
+        """
+        Structural anchors: search boxes and submit buttons, which prompts often
+        use without naming them ("search for ...", "submit the form").
+
+        Args:
+            elements: Element information from the page context
+
+        Returns:
+            List[int]: Indexes of at most max_anchors anchors, in document order
+        """
+        anchors = [index for index, element in enumerate(elements)
+                   if isinstance(element, dict) and element.get('type') in ('search', 'submit')]
+        return anchors[:self.max_anchors]
+
+
+class ElementSelection:
+    """
+    The elements of a page sent to the LLM for one prompt: the top_k most
+    relevant and the anchors, in document order, widened on request at most
+    max_widenings times.
+    Elements are ranked on first access, a cached instruction never needs them.
+    """
+
+    def __init__(self, ranker: ElementRanker, prompt: str, elements: List[Dict[str, Any]],
+                 top_k: int = 50, growth: int = 4, max_widenings: int = 2):
+        """
+        Initialize the selection.
+
+        Args:
+            ranker: The element ranker
+            prompt: The prompt
+            elements: All elements of the page context
+            top_k: Number of relevant elements to select first, 0 selects every element
+            growth: Factor applied to top_k when the selection is widened
+            max_widenings: Most times the selection is widened, every retry is another LLM call
+        """
+        self.ranker = ranker
+        self.prompt = prompt
+        self.all_elements = elements
+        self.top_k = top_k
+        self.growth = max(2, growth)
+        self.max_widenings = max_widenings
+        self.widenings = 0
+        self._order = None
+        self._anchors = None
+        self._elements = None
+
+    @property
+    def complete(self) -> bool:
+        """Every element is selected"""
+        return self.top_k <= 0 or self.top_k >= len(self.all_elements)
+
+    @property
+    def exhausted(self) -> bool:
+        """The selection can't be widened anymore"""
+        return self.complete or self.widenings >= self.max_widenings
+
+    @property
+    def elements(self) -> List[Dict[str, Any]]:
+        """The selected elements, in document order"""
+        if self._elements is None:
+            if self.complete:
+                self._elements = self.all_elements
+            else:
+                if self._order is None:
+                    self._order = self.ranker.rank(self.prompt, self.all_elements)
+                    self._anchors = self.ranker.anchors(self.all_elements)
+                selected = set(self._order[:self.top_k])
+                selected.update(self._anchors)
+                self._elements = [self.all_elements[index] for index in sorted(selected)]
+        return self._elements
+
+    def widen(self) -> bool:
+        """
+        Select growth times more elements.
+
+        Returns:
+            bool: True if more elements are selected, False if the selection is exhausted
+        """
+        if self.exhausted:
+            return False
+        self.widenings += 1
+        self.top_k *= self.growth
+        self._elements = None
+        return True
@@ -4,7 +4,8 @@ from typing import Any, Dict
 from loguru import logger
 from playwright.sync_api import Page
 
-from autowing.core.ai_fixture_web import AiFixtureWeb
+from autowing.core.ai_fixture_web import (CHANGE_TRACKER_FUNCTION, PAGE_ELEMENTS_FUNCTION, PAGE_SNAPSHOT_FUNCTION,
+                                         TEXT_HASH_FUNCTION, AiFixtureWeb)
 from autowing.core.llm.factory import LLMFactory
 from autowing.utils.transition import selector_to_locator
 
@@ -26,73 +27,10 @@ class PlaywrightAiFixture(AiFixtureWeb):
         self.page = page
         self.llm_client = LLMFactory.create()
 
-    def get_cache_statistics(self) -> dict:
-        """
-        Get cache usage statistics.
-        
-        Returns:
-            Dictionary containing cache statistics
-        """
-        return self.cache_manager.get_statistics()
-
     def _execute_marker_injection_script(self) -> Any:
         """Execute the JavaScript marker injection script for Playwright."""
-        marker_script = """
-        (() => {
-            // Function to generate unique ID
-            function generateUniqueId() {
-                return 'aw-' + Math.random().toString(36).substr(2, 9);
-            }
-            
-            // Define element selectors that need marking
-            const selectors = [
-                'input:not([type="hidden"])',
-                'textarea',
-                'select',
-                'button',
-                'a[href]',
-                '[role="button"]',
-                '[role="link"]',
-                '[role="checkbox"]',
-                '[role="radio"]',
-                '[role="searchbox"]',
-                'summary',
-                '[contenteditable="true"]',
-                '[tabindex]:not([tabindex="-1"])'
-            ];
-            
-            const markers = [];
-            
-            selectors.forEach(selector => {
-                document.querySelectorAll(selector).forEach(element => {
-                    // Skip already marked elements
-                    if (element.hasAttribute('data-autowing-id')) {
-                        return;
-                    }
-                    
-                    // Generate unique ID
-                    const uniqueId = generateUniqueId();
-                    element.setAttribute('data-autowing-id', uniqueId);
-                    
-                    // Collect element information
-                    markers.push({
-                        id: uniqueId,
-                        tagName: element.tagName.toLowerCase(),
-                        type: element.getAttribute('type') || null,
-                        placeholder: element.getAttribute('placeholder') || null,
-                        value: element.value || null,
-                        textContent: element.textContent?.trim().substring(0, 100) || '',
-                        ariaLabel: element.getAttribute('aria-label') || null,
-                        role: element.getAttribute('role') || null,
-                        boundingBox: element.getBoundingClientRect()
-                    });
-                });
-            });
-            
-            return markers;
-        })();
-        """
-        return self.page.evaluate(marker_script)
+        return self.page.evaluate(f"(visibility) => ({PAGE_ELEMENTS_FUNCTION})(true, visibility).markers",
+                                  self._viewport_filter)
 
     def _get_basic_page_info(self) -> Dict[str, str]:
         """Get basic page information for Playwright."""
@@ -103,55 +41,20 @@ class PlaywrightAiFixture(AiFixtureWeb):
 
     def _execute_elements_script(self) -> Any:
         """Execute JavaScript to get page elements information for Playwright."""
-        return self.page.evaluate("""() => {
-            const getVisibleElements = () => {
-                const elements = [];
-                const selectors = [
-                    'input',
-                    'textarea',
-                    'select',
-                    'button',
-                    'a',
-                    '[role="button"]',
-                    '[role="link"]',
-                    '[role="checkbox"]',
-                    '[role="radio"]',
-                    '[role="searchbox"]',
-                    'summary',
-                    '[draggable="true"]'
-                ];
-                
-                for (const selector of selectors) {
-                    document.querySelectorAll(selector).forEach(el => {
-                        if (el.offsetWidth > 0 && el.offsetHeight > 0) {
-                            elements.push({
-                                tag: el.tagName.toLowerCase(),
-                                type: el.getAttribute('type') || null,
-                                placeholder: el.getAttribute('placeholder') || null,
-                                value: el.value || null,
-                                text: el.textContent?.trim() || '',
-                                aria: el.getAttribute('aria-label') || null,
-                                id: el.id || '',
-                                name: el.getAttribute('name') || null,
-                                class: el.className || '',
-                                draggable: el.getAttribute('draggable') || null,
-                                // New addition: include autowing marker ID
-                                autowingId: el.getAttribute('data-autowing-id') || null,
-                                // New addition: element position information
-                                boundingBox: {
-                                    x: el.getBoundingClientRect().x,
-                                    y: el.getBoundingClientRect().y,
-                                    width: el.getBoundingClientRect().width,
-                                    height: el.getBoundingClientRect().height
-                                }
-                            });
-                        }
-                    });
-                }
-                return elements;
-            };
-            return getVisibleElements();
-        }""")
+        return self.page.evaluate(f"(visibility) => ({PAGE_ELEMENTS_FUNCTION})(false, visibility).elements",
+                                  self._viewport_filter)
+
+    def _execute_snapshot_script(self, options: Dict[str, Any]) -> Any:
+        """Execute the page snapshot script for Playwright."""
+        return self.page.evaluate(f"({PAGE_SNAPSHOT_FUNCTION})", options)
+
+    def _execute_change_tracker_script(self) -> Any:
+        """Execute the page change tracker script for Playwright."""
+        return self.page.evaluate(f"({CHANGE_TRACKER_FUNCTION})")
+
+    def _execute_text_hash_script(self) -> Any:
+        """Execute JavaScript to hash the visible page text for Playwright."""
+        return self.page.evaluate(f"({TEXT_HASH_FUNCTION})")
 
     def _find_element_by_marker(self, marker_id: str):
         """
@@ -192,6 +95,8 @@ class PlaywrightAiFixture(AiFixtureWeb):
         logger.info(f"🪽 AI Action: {prompt}")
         context = self._get_page_context()
         context["elements"] = self._remove_empty_keys(context.get("elements", []))
+        # Only the elements most relevant to the prompt are sent, more if the instruction fails
+        selection = self._select_elements(prompt, context["elements"])
 
         def compute_action():
             # Most strict prompt, force specific field names
@@ -208,7 +113,7 @@ REQUIRED JSON FORMAT:
 
 CURRENT CONTEXT:
 URL: {context['url']}
-Elements: {json.dumps(context['elements'], indent=2)}
+Elements: {json.dumps(selection.elements, indent=2)}
 
 REQUEST: {prompt}
 
@@ -224,7 +129,7 @@ EXAMPLE:
 RESPONSE (JSON ONLY):
 """
 
-            response = self.llm_client.complete(action_prompt)
+            response = self._complete(action_prompt)
             cleaned_response = self._clean_response(response)
 
             # Validate response is valid JSON
@@ -240,10 +145,31 @@ RESPONSE (JSON ONLY):
                 logger.error(f"❌ JSON parsing failed. Response content: {cleaned_response[:200]}...")
                 raise ValueError(f"LLM returned invalid JSON format: {e}")
 
-        # Use cache manager to get or compute the instruction
-        instruction = self._get_cached_or_compute(prompt, context, compute_action)
+        # Execute the cached instruction, or a fresh one if it no longer matches the page
+        self._execute_cached_or_compute(prompt, context, compute_action, self._execute_instruction,
+                                        selection, self._instruction_target_exists)
+
+    def _instruction_target_exists(self, instruction: dict) -> bool:
+        """Check the target element of an instruction for Playwright."""
+        try:
+            self.page.locator(selector_to_locator(instruction['selector'])).first.wait_for(
+                state="attached", timeout=self.cached_instruction_timeout * 1000)
+            return True
+        except Exception:
+            return False
 
-        # Execute the action using the instruction
+    def _execute_instruction(self, instruction: dict, cached: bool = False) -> None:
+        """
+        Perform the action of an instruction.
+
+        Args:
+            instruction (dict): The instruction with 'selector', 'action' and optional 'value'/'key'
+            cached (bool): The instruction comes from the cache, its element must be
+                           actionable (attached, visible, not covered) within cached_instruction_timeout
+
+        Raises:
+            ValueError: If the instruction is invalid
+        """
         selector = instruction.get('selector')
         action = instruction.get('action')
 
@@ -253,15 +179,18 @@ RESPONSE (JSON ONLY):
         # Perform the action
         selector = selector_to_locator(selector)
         element = self.page.locator(selector)
+        # A stale cached target (missing, hidden or covered) fails quickly instead of
+        # waiting for the default action timeout
+        options = {"timeout": self.cached_instruction_timeout * 1000} if cached else {}
 
         if action == 'click':
-            element.click()
+            element.click(**options)
         elif action == 'fill':
-            element.fill(instruction.get('value', ''))
+            element.fill(instruction.get('value', ''), **options)
             if instruction.get('key'):
-                element.press(instruction.get('key'))
+                element.press(instruction.get('key'), **options)
         elif action == 'press':
-            element.press(instruction.get('key', 'Enter'))
+            element.press(instruction.get('key', 'Enter'), **options)
         else:
             raise ValueError(f"Unsupported action: {action}")
 
@@ -281,7 +210,7 @@ RESPONSE (JSON ONLY):
             ValueError: If the AI response cannot be parsed into the requested format
         """
         logger.info(f"🪽 AI Query: {prompt}")
-        context = self._get_page_context()
+        context = self._get_content_context()
         context["elements"] = self._remove_empty_keys(context.get("elements", []))
 
         # Parse the requested data format
@@ -330,48 +259,53 @@ Return format:
 No other text or explanation.
 """
 
-        response = self.llm_client.complete(query_prompt)
+        def compute_query():
+            response = self._complete(query_prompt)
 
-        try:
-            cleaned_response = self._clean_response(response)
             try:
-                result = json.loads(cleaned_response)
-                query_info = self._validate_result_format(result, format_hint)
-                logger.debug(f"📄 Query: {query_info}")
-                return query_info
-            except json.JSONDecodeError:
-                # If it's a string array format, try extracting from text
-                if format_hint == 'string[]':
-                    # Split and clean text
-                    lines = [line.strip() for line in cleaned_response.split('\n')
-                             if line.strip() and not line.startswith(('-', '*', '#'))]
-
-                    # Extract lines containing query terms
-                    query_terms = [term.lower() for term in prompt.split()
-                                   if len(term) > 2 and term.lower() not in ['the', 'and', 'for']]
-
-                    results = []
-                    for line in lines:
-                        # Check if line contains query terms
-                        if any(term in line.lower() for term in query_terms):
-                            # Clean text
-                            text = line.strip('`"\'- ,')
-                            if ':' in text:
-                                text = text.split(':', 1)[1].strip()
-                            if text:
-                                results.append(text)
-
-                    if results:
-                        # Remove duplicates while preserving order
-                        seen = set()
-                        query_info = [x for x in results if not (x in seen or seen.add(x))]
-                        logger.debug(f"📄 Query: {query_info}")
-                        return query_info
-
-                raise ValueError(f"Failed to parse response as JSON: {cleaned_response[:100]}...")
-
-        except Exception as e:
-            raise ValueError(f"Query failed. Error: {str(e)}\nResponse: {cleaned_response[:100]}...")
+                cleaned_response = self._clean_response(response)
+                try:
+                    result = json.loads(cleaned_response)
+                    query_info = self._validate_result_format(result, format_hint)
+                    logger.debug(f"📄 Query: {query_info}")
+                    return query_info
+                except json.JSONDecodeError:
+                    # If it's a string array format, try extracting from text
+                    if format_hint == 'string[]':
+                        # Split and clean text
+                        lines = [line.strip() for line in cleaned_response.split('\n')
+                                 if line.strip() and not line.startswith(('-', '*', '#'))]
+
+                        # Extract lines containing query terms
+                        query_terms = [term.lower() for term in prompt.split()
+                                       if len(term) > 2 and term.lower() not in ['the', 'and', 'for']]
+
+                        results = []
+                        for line in lines:
+                            # Check if line contains query terms
+                            if any(term in line.lower() for term in query_terms):
+                                # Clean text
+                                text = line.strip('`"\'- ,')
+                                if ':' in text:
+                                    text = text.split(':', 1)[1].strip()
+                                if text:
+                                    results.append(text)
+
+                        if results:
+                            # Remove duplicates while preserving order
+                            seen = set()
+                            query_info = [x for x in results if not (x in seen or seen.add(x))]
+                            logger.debug(f"📄 Query: {query_info}")
+                            return query_info
+
+                    raise ValueError(f"Failed to parse response as JSON: {cleaned_response[:100]}...")
+
+            except Exception as e:
+                raise ValueError(f"Query failed. Error: {str(e)}\nResponse: {cleaned_response[:100]}...")
+
+        # Without the text hash a cached result could be stale
+        return self._get_cached_or_compute(prompt, context, compute_query, operation="query",
+                                           format_hint=format_hint, use_cache=context["textHash"] is not None)
 
     def ai_assert(self, prompt: str) -> bool:
         """
@@ -387,7 +321,7 @@ No other text or explanation.
             ValueError: If the AI response cannot be parsed as a boolean value
         """
         logger.info(f"🪽 AI Assert: {prompt}")
-        context = self._get_page_context()
+        context = self._get_content_context()
         context["elements"] = self._remove_empty_keys(context.get("elements", []))
 
         # Optimize the prompt to be concise and explicitly require a boolean return
@@ -402,30 +336,34 @@ Assertion: {prompt}
 IMPORTANT: Return ONLY the word 'true' or 'false' (lowercase). No other text, no explanation.
 """
 
-        response = self.llm_client.complete(assert_prompt)
-        cleaned_response = self._clean_response(response).lower()
+        def compute_assert():
+            response = self._complete(assert_prompt)
+            cleaned_response = self._clean_response(response).lower()
 
-        try:
-            # Directly match true or false
-            if cleaned_response == 'true':
-                return True
-            if cleaned_response == 'false':
-                return False
-
-            # If responses contain other content, try extracting boolean
-            if 'true' in cleaned_response.split():
-                return True
-            if 'false' in cleaned_response.split():
-                return False
-
-            raise ValueError("Response must be 'true' or 'false'")
-
-        except Exception as e:
-            # Provide more useful error information
-            raise ValueError(
-                f"Failed to parse assertion result. Response: {cleaned_response[:100]}... "
-                f"Error: {str(e)}"
-            )
+            try:
+                # Directly match true or false
+                if cleaned_response == 'true':
+                    return True
+                if cleaned_response == 'false':
+                    return False
+
+                # If responses contain other content, try extracting boolean
+                if 'true' in cleaned_response.split():
+                    return True
+                if 'false' in cleaned_response.split():
+                    return False
+
+                raise ValueError("Response must be 'true' or 'false'")
+
+            except Exception as e:
+                # Provide more useful error information
+                raise ValueError(
+                    f"Failed to parse assertion result. Response: {cleaned_response[:100]}... "
+                    f"Error: {str(e)}"
+                )
+
+        return self._get_cached_or_compute(prompt, context, compute_assert, operation="assert",
+                                           use_cache=context["textHash"] is not None)
 
     def ai_function_cases(self, prompt: str, language: str = "Chinese") -> str:
         """
@@ -530,14 +468,19 @@ Expected Result: Describe the expected result.
 Finally, the output result is required to be in {language}
 """
 
-        try:
-            response = self.llm_client.complete(case_prompt)
-            cleaned_response = self._clean_response(response)
+        def compute_cases():
+            try:
+                response = self._complete(case_prompt)
+                cleaned_response = self._clean_response(response)
+
+                logger.debug(f"""📄 Function Cases:\n {cleaned_response}""")
+                return cleaned_response
+            except Exception as e:
+                raise ValueError(f"Failed to generate test cases. Error: {str(e)}\nResponse: {cleaned_response[:100]}...")
 
-            logger.debug(f"""📄 Function Cases:\n {cleaned_response}""")
-            return cleaned_response
-        except Exception as e:
-            raise ValueError(f"Failed to generate test cases. Error: {str(e)}\nResponse: {cleaned_response[:100]}...")
+        # Cases in another language are another result
+        return self._get_cached_or_compute(prompt, context, compute_cases, operation="function_cases",
+                                           format_hint=f"{format_hint}:{language}")
 
 
 def create_fixture():
@@ -2,14 +2,15 @@ import json
 from typing import Any, Dict
 
 from loguru import logger
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import InvalidSelectorException, NoSuchElementException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
-from autowing.core.ai_fixture_web import AiFixtureWeb
+from autowing.core.ai_fixture_web import (CHANGE_TRACKER_FUNCTION, PAGE_ELEMENTS_FUNCTION, PAGE_SNAPSHOT_FUNCTION,
+                                         TEXT_HASH_FUNCTION, AiFixtureWeb)
 from autowing.core.llm.factory import LLMFactory
 from autowing.utils.transition import selector_to_selenium
 
@@ -30,87 +31,14 @@ class SeleniumAiFixture(AiFixtureWeb):
         """
         super().__init__()
         self.driver = driver
-        self.wait = WebDriverWait(driver, 10)
+        self.timeout = 10
+        self.wait = WebDriverWait(driver, self.timeout)
         self.llm_client = LLMFactory.create()
 
-    def get_cache_statistics(self) -> dict:
-        """
-        Get cache usage statistics.
-        
-        Returns:
-            Dictionary containing cache statistics
-        """
-        return self.cache_manager.get_statistics()
-
     def _execute_marker_injection_script(self) -> Any:
         """Execute the JavaScript marker injection script for Selenium."""
-        marker_script = """
-        (() => {
-            // Function to generate unique ID
-            function generateUniqueId() {
-                return 'aw-' + Math.random().toString(36).substr(2, 9);
-            }
-            
-            // Define element selectors that need marking
-            const selectors = [
-                'input:not([type="hidden"])',
-                'textarea',
-                'select',
-                'button',
-                'a[href]',
-                '[role="button"]',
-                '[role="link"]',
-                '[role="checkbox"]',
-                '[role="radio"]',
-                '[role="searchbox"]',
-                'summary',
-                '[contenteditable="true"]',
-                '[tabindex]:not([tabindex="-1"])'
-            ];
-            
-            const markers = [];
-            
-            selectors.forEach((selector) => {
-                const elements = document.querySelectorAll(selector);
-                elements.forEach((element) => {
-                    // Skip already marked elements
-                    if (element.hasAttribute('data-autowing-id')) {
-                        return;
-                    }
-                    
-                    // Skip invisible elements
-                    if (element.offsetWidth <= 0 || element.offsetHeight <= 0) {
-                        return;
-                    }
-                    
-                    // Generate unique ID
-                    const uniqueId = generateUniqueId();
-                    element.setAttribute('data-autowing-id', uniqueId);
-                    
-                    // Collect element information (same as Playwright)
-                    markers.push({
-                        id: uniqueId,
-                        tagName: element.tagName.toLowerCase(),
-                        type: element.getAttribute('type') || null,
-                        placeholder: element.getAttribute('placeholder') || null,
-                        value: element.value || null,
-                        textContent: element.textContent ? element.textContent.trim().substring(0, 100) : '',
-                        ariaLabel: element.getAttribute('aria-label') || null,
-                        role: element.getAttribute('role') || null,
-                        boundingBox: {
-                            x: element.getBoundingClientRect().x,
-                            y: element.getBoundingClientRect().y,
-                            width: element.getBoundingClientRect().width,
-                            height: element.getBoundingClientRect().height
-                        }
-                    });
-                });
-            });
-            
-            return markers;
-        })();
-        """
-        return self.driver.execute_script(marker_script)
+        return self.driver.execute_script(f"return ({PAGE_ELEMENTS_FUNCTION})(true, arguments[0]).markers;",
+                                          self._viewport_filter)
 
     def _get_basic_page_info(self) -> Dict[str, str]:
         """Get basic page information for Selenium."""
@@ -121,59 +49,20 @@ class SeleniumAiFixture(AiFixtureWeb):
 
     def _execute_elements_script(self) -> Any:
         """Execute JavaScript to get page elements information for Selenium."""
-        elements_script = """
-            return (function() {
-                var getVisibleElements = function() {
-                    var elements = [];
-                    var selectors = [
-                        'input',
-                        'textarea',
-                        'select',
-                        'button',
-                        'a',
-                        '[role="button"]',
-                        '[role="link"]',
-                        '[role="checkbox"]',
-                        '[role="radio"]',
-                        '[role="searchbox"]',
-                        'summary',
-                        '[draggable="true"]'
-                    ];
-                    
-                    selectors.forEach(function(selector) {
-                        var els = document.querySelectorAll(selector);
-                        els.forEach(function(el) {
-                            if (el.offsetWidth > 0 && el.offsetHeight > 0) {
-                                elements.push({
-                                    tag: el.tagName.toLowerCase(),
-                                    type: el.getAttribute('type') || null,
-                                    placeholder: el.getAttribute('placeholder') || null,
-                                    value: el.value || null,
-                                    text: el.textContent ? el.textContent.trim() : '',
-                                    aria: el.getAttribute('aria-label') || null,
-                                    id: el.id || '',
-                                    name: el.getAttribute('name') || null,
-                                    class: el.className || '',
-                                    draggable: el.getAttribute('draggable') || null,
-                                    // New addition: include autowing marker ID
-                                    autowingId: el.getAttribute('data-autowing-id') || null,
-                                    // New addition: element position information
-                                    boundingBox: {
-                                        x: el.getBoundingClientRect().x,
-                                        y: el.getBoundingClientRect().y,
-                                        width: el.getBoundingClientRect().width,
-                                        height: el.getBoundingClientRect().height
-                                    }
-                                });
-                            }
-                        });
-                    });
-                    return elements;
-                };
-                return getVisibleElements();
-            })();
-        """
-        return self.driver.execute_script(elements_script)
+        return self.driver.execute_script(f"return ({PAGE_ELEMENTS_FUNCTION})(false, arguments[0]).elements;",
+                                          self._viewport_filter)
+
+    def _execute_snapshot_script(self, options: Dict[str, Any]) -> Any:
+        """Execute the page snapshot script for Selenium."""
+        return self.driver.execute_script(f"return ({PAGE_SNAPSHOT_FUNCTION})(arguments[0]);", options)
+
+    def _execute_change_tracker_script(self) -> Any:
+        """Execute the page change tracker script for Selenium."""
+        return self.driver.execute_script(f"return ({CHANGE_TRACKER_FUNCTION})();")
+
+    def _execute_text_hash_script(self) -> Any:
+        """Execute JavaScript to hash the visible page text for Selenium."""
+        return self.driver.execute_script(f"return ({TEXT_HASH_FUNCTION})();")
 
     def _find_element_by_marker(self, marker_id: str):
         """
@@ -220,6 +109,8 @@ class SeleniumAiFixture(AiFixtureWeb):
         logger.info(f"🪽 AI Action: {prompt}")
         context = self._get_page_context()
         context["elements"] = self._remove_empty_keys(context.get("elements", []))
+        # Only the elements most relevant to the prompt are sent, more if the instruction fails
+        selection = self._select_elements(prompt, context["elements"])
 
         def compute_action():
             # Most strict prompt, force specific field names
@@ -236,7 +127,7 @@ REQUIRED JSON FORMAT:
 
 CURRENT CONTEXT:
 URL: {context['url']}
-Elements: {json.dumps(context['elements'], indent=2)}
+Elements: {json.dumps(selection.elements, indent=2)}
 
 REQUEST: {prompt}
 
@@ -252,7 +143,7 @@ EXAMPLE:
 RESPONSE (JSON ONLY):
 """
 
-            response = self.llm_client.complete(action_prompt)
+            response = self._complete(action_prompt)
             cleaned_response = self._clean_response(response)
             
             # Validate response is valid JSON
@@ -268,10 +159,56 @@ RESPONSE (JSON ONLY):
                 logger.error(f"❌ JSON parsing failed. Response content: {cleaned_response[:200]}...")
                 raise ValueError(f"LLM returned invalid JSON format: {e}")
 
-        # Use cache manager to get or compute the instruction
-        instruction = self._get_cached_or_compute(prompt, context, compute_action)
-        
-        # Execute the action using the instruction
+        # Execute the cached instruction, or a fresh one if it no longer matches the page
+        self._execute_cached_or_compute(prompt, context, compute_action, self._execute_instruction,
+                                        selection, self._instruction_target_exists)
+
+    def _instruction_target_exists(self, instruction: dict) -> bool:
+        """Check the target element of an instruction for Selenium."""
+        try:
+            self._find_element(selector_to_selenium(instruction['selector']), self.cached_instruction_timeout)
+            return True
+        except Exception:
+            return False
+
+    def _find_element(self, selector: str, timeout: float):
+        """
+        Wait for the element of a selector, trying it as XPath then as CSS selector on every poll.
+
+        Args:
+            selector (str): XPath or CSS selector
+            timeout (float): Seconds to wait for the element
+
+        Returns:
+            WebElement: The element
+
+        Raises:
+            TimeoutException: If no element matches within the timeout
+        """
+        def locate(driver):
+            for by in (By.XPATH, By.CSS_SELECTOR):
+                try:
+                    return driver.find_element(by, selector)
+                except (NoSuchElementException, InvalidSelectorException):
+                    continue
+            return False
+
+        return WebDriverWait(self.driver, timeout).until(
+            locate, f"No element matches selector: {selector}")
+
+    def _execute_instruction(self, instruction: dict, cached: bool = False) -> None:
+        """
+        Perform the action of an instruction.
+
+        Args:
+            instruction (dict): The instruction with 'selector', 'action' and optional 'value'/'key'
+            cached (bool): The instruction comes from the cache, its element must show up
+                           within cached_instruction_timeout
+
+        Raises:
+            ValueError: If the instruction is invalid
+            TimeoutException: If the element cannot be found
+        """
         selector = instruction.get('selector')
         action = instruction.get('action')
 
@@ -280,10 +217,7 @@ RESPONSE (JSON ONLY):
 
         # Execute the action
         selector = selector_to_selenium(selector)
-        try:
-            element = self.wait.until(EC.presence_of_element_located((By.XPATH, selector)))
-        except TimeoutException:
-            element = self.wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
+        element = self._find_element(selector, self.cached_instruction_timeout if cached else self.timeout)
 
         if action == 'click':
             element.click()
@@ -317,7 +251,7 @@ RESPONSE (JSON ONLY):
             ValueError: If the AI response cannot be parsed into the requested format
         """
         logger.info(f"🪽 AI Query: {prompt}")
-        context = self._get_page_context()
+        context = self._get_content_context()
         context["elements"] = self._remove_empty_keys(context.get("elements", []))
 
         # Parse the requested data format
@@ -365,38 +299,43 @@ Return format:
 No other text or explanation.
 """
 
-        response = self.llm_client.complete(query_prompt)
-        cleaned_response = self._clean_response(response)
-        try:
-            result = json.loads(cleaned_response)
-            query_info = self._validate_result_format(result, format_hint)
-            logger.debug(f"📄 Query: {query_info}")
-            return query_info
-        except json.JSONDecodeError:
-            # If it's a string array format, try extracting from text
-            if format_hint == 'string[]':
-                lines = [line.strip() for line in cleaned_response.split('\n')
-                         if line.strip() and not line.startswith(('-', '*', '#'))]
-
-                query_terms = [term.lower() for term in prompt.split()
-                               if len(term) > 2 and term.lower() not in ['the', 'and', 'for']]
-
-                results = []
-                for line in lines:
-                    if any(term in line.lower() for term in query_terms):
-                        text = line.strip('`"\'- ,')
-                        if ':' in text:
-                            text = text.split(':', 1)[1].strip()
-                        if text:
-                            results.append(text)
-
-                if results:
-                    seen = set()
-                    query_info = [x for x in results if not (x in seen or seen.add(x))]
-                    logger.debug(f"📄 Query: {query_info}")
-                    return query_info
-
-            raise ValueError(f"Failed to parse response as JSON: {cleaned_response[:100]}...")
+        def compute_query():
+            response = self._complete(query_prompt)
+            cleaned_response = self._clean_response(response)
+            try:
+                result = json.loads(cleaned_response)
+                query_info = self._validate_result_format(result, format_hint)
+                logger.debug(f"📄 Query: {query_info}")
+                return query_info
+            except json.JSONDecodeError:
+                # If it's a string array format, try extracting from text
+                if format_hint == 'string[]':
+                    lines = [line.strip() for line in cleaned_response.split('\n')
+                             if line.strip() and not line.startswith(('-', '*', '#'))]
+
+                    query_terms = [term.lower() for term in prompt.split()
+                                   if len(term) > 2 and term.lower() not in ['the', 'and', 'for']]
+
+                    results = []
+                    for line in lines:
+                        if any(term in line.lower() for term in query_terms):
+                            text = line.strip('`"\'- ,')
+                            if ':' in text:
+                                text = text.split(':', 1)[1].strip()
+                            if text:
+                                results.append(text)
+
+                    if results:
+                        seen = set()
+                        query_info = [x for x in results if not (x in seen or seen.add(x))]
+                        logger.debug(f"📄 Query: {query_info}")
+                        return query_info
+
+                raise ValueError(f"Failed to parse response as JSON: {cleaned_response[:100]}...")
+
+        # Without the text hash a cached result could be stale
+        return self._get_cached_or_compute(prompt, context, compute_query, operation="query",
+                                           format_hint=format_hint, use_cache=context["textHash"] is not None)
 
     def ai_assert(self, prompt: str) -> bool:
         """
@@ -412,7 +351,7 @@ No other text or explanation.
             ValueError: If the AI response cannot be parsed as a boolean value
         """
         logger.info(f"🪽 AI Assert: {prompt}")
-        context = self._get_page_context()
+        context = self._get_content_context()
         context["elements"] = self._remove_empty_keys(context.get("elements", []))
 
         assert_prompt = f"""
@@ -426,22 +365,26 @@ Assertion: {prompt}
 IMPORTANT: Return ONLY the word 'true' or 'false' (lowercase). No other text, no explanation.
 """
 
-        response = self.llm_client.complete(assert_prompt)
-        cleaned_response = self._clean_response(response).lower()
+        def compute_assert():
+            response = self._complete(assert_prompt)
+            cleaned_response = self._clean_response(response).lower()
 
-        # Directly match true or false
-        if cleaned_response == 'true':
-            return True
-        if cleaned_response == 'false':
-            return False
+            # Directly match true or false
+            if cleaned_response == 'true':
+                return True
+            if cleaned_response == 'false':
+                return False
 
-        # If response contains other content, try extracting boolean
-        if 'true' in cleaned_response.split():
-            return True
-        if 'false' in cleaned_response.split():
-            return False
+            # If response contains other content, try extracting boolean
+            if 'true' in cleaned_response.split():
+                return True
+            if 'false' in cleaned_response.split():
+                return False
+
+            raise ValueError("Response must be 'true' or 'false'")
 
-        raise ValueError("Response must be 'true' or 'false'")
+        return self._get_cached_or_compute(prompt, context, compute_assert, operation="assert",
+                                           use_cache=context["textHash"] is not None)
 
     def ai_function_cases(self, prompt: str, language: str = "Chinese") -> str:
         """
@@ -546,14 +489,19 @@ Expected Result: Describe the expected result.
 Finally, the output result is required to be in {language}
 """
 
-        try:
-            response = self.llm_client.complete(case_prompt)
-            cleaned_response = self._clean_response(response)
+        def compute_cases():
+            try:
+                response = self._complete(case_prompt)
+                cleaned_response = self._clean_response(response)
+
+                logger.debug(f"""📄 Function Cases:\n {cleaned_response}""")
+                return cleaned_response
+            except Exception as e:
+                raise ValueError(f"Failed to generate test cases. Error: {str(e)}\nResponse: {cleaned_response[:100]}...")
 
-            logger.debug(f"""📄 Function Cases:\n {cleaned_response}""")
-            return cleaned_response
-        except Exception as e:
-            raise ValueError(f"Failed to generate test cases. Error: {str(e)}\nResponse: {cleaned_response[:100]}...")
+        # Cases in another language are another result
+        return self._get_cached_or_compute(prompt, context, compute_cases, operation="function_cases",
+                                           format_hint=f"{format_hint}:{language}")
 
 
 def create_fixture():
@@ -0,0 +1,69 @@
+"""
+Benchmark of the prompt aware element ranking on a synthetic admin page.
+
+Compares the elements section of the ai_action prompt with every element of the
+page against the top-K most relevant elements plus anchors, and checks that the
+target of every prompt is part of the selection. No browser or LLM is needed.
+
+run:
+> python examples/benchmark_element_ranking.py
+"""
+import json
+import time
+
+from autowing.core.ai_fixture_base import AiFixtureBase
+from autowing.core.element_ranker import ElementRanker, ElementSelection
+
+TOP_K = 50
+
+
+def make_elements(rows: int = 2000) -> list:
+    """Elements of an order list with a few page controls"""
+    elements = [
+        {"tag": "input", "type": "search", "id": "globalSearch", "placeholder": "Search orders"},
+        {"tag": "button", "type": "submit", "text": "Go"},
+        {"tag": "a", "text": "Dashboard", "class": "nav-link"},
+        {"tag": "a", "text": "设置", "class": "nav-link"},
+    ]
+    for i in range(rows):
+        elements += [
+            {"tag": "a", "text": f"Order #{i}", "boundingBox": {"x": 20, "y": 80 + i * 40, "width": 90, "height": 20}},
+            {"tag": "button", "text": f"Edit {i}", "class": "btn btn-primary"},
+            {"tag": "input", "name": f"qty-{i}", "placeholder": "Quantity", "value": str(i % 7)},
+            {"tag": "span", "text": f"Details {i}"},
+        ]
+    elements += [
+        {"tag": "button", "id": "logoutBtn", "text": "Log out"},
+        {"tag": "button", "aria": "退出登录", "text": "退出"},
+    ]
+    return elements
+
+
+PROMPTS = [
+    ('search for "refund" in the search box and press enter', "globalSearch"),
+    ("click the log out button", "Log out"),
+    ("点击退出登录", "退出"),
+    ("open the details of order 1234", "Order #1234"),
+    ("set the quantity of order 42 to 3", "qty-42"),
+]
+
+
+def main():
+    elements = make_elements()
+    ranker = ElementRanker()
+    full = json.dumps(elements, indent=2)
+    print(f"{len(elements)} elements, {AiFixtureBase._estimate_tokens(full):,} tokens with every element")
+
+    for prompt, target in PROMPTS:
+        start = time.perf_counter()
+        selection = ElementSelection(ranker, prompt, elements, TOP_K)
+        selected = selection.elements
+        elapsed = time.perf_counter() - start
+        payload = json.dumps(selected, indent=2)
+        found = any(target in json.dumps(element, ensure_ascii=False) for element in selected)
+        print(f"{prompt[:40]:<40} {elapsed * 1000:>6.1f} ms {len(selected):>4} elements "
+              f"{AiFixtureBase._estimate_tokens(payload):>6,} tokens  target {'found' if found else 'MISSING'}")
+
+
+if __name__ == '__main__':
+    main()
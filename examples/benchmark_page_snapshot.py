@@ -0,0 +1,205 @@
+"""
+Benchmark of the web page context capture on a synthetic page with 10k elements.
+
+Compares the separate marker injection and elements scripts the fixtures used before
+(one querySelectorAll per selector, markers written between rect reads, four
+getBoundingClientRect() calls per element in the elements script) with the single
+snapshot script, which walks the page once, deduplicates elements and reads every
+rect once, and with the viewport filter that drops the elements far outside the
+viewport.
+
+The snapshot script no longer marks invisible elements, the legacy marker script
+marked every matching element.
+
+run:
+> pip install playwright && playwright install chromium
+> python examples/benchmark_page_snapshot.py
+"""
+import json
+import statistics
+import time
+
+from playwright.sync_api import sync_playwright
+
+from autowing.core.ai_fixture_web import PAGE_SNAPSHOT_FUNCTION
+
+ROUNDS = 5
+
+SYNTHETIC_PAGE = """
+<html><head><title>Synthetic admin page</title></head><body><script>
+const root = document.body;
+for (let i = 0; i < 2000; i++) {
+    const row = document.createElement('div');
+    row.innerHTML = `
+        <a href="/orders/${i}">Order #${i}</a>
+        <button role="button" class="btn btn-primary">Edit ${i}</button>
+        <input name="qty-${i}" placeholder="Quantity" value="${i % 7}">
+        <span role="link" tabindex="0">Details ${i}</span>
+        <input type="hidden" name="token-${i}" value="x">
+        <a href="/orders/${i}/hidden" style="display:none">Hidden ${i}</a>`;
+    root.appendChild(row);
+}
+</script></body></html>
+"""
+
+# The marker injection and elements scripts of the fixtures before the snapshot script, verbatim
+LEGACY_MARKER_SCRIPT = """
+        (() => {
+            // Function to generate unique ID
+            function generateUniqueId() {
+                return 'aw-' + Math.random().toString(36).substr(2, 9);
+            }
+            
+            // Define element selectors that need marking
+            const selectors = [
+                'input:not([type="hidden"])',
+                'textarea',
+                'select',
+                'button',
+                'a[href]',
+                '[role="button"]',
+                '[role="link"]',
+                '[role="checkbox"]',
+                '[role="radio"]',
+                '[role="searchbox"]',
+                'summary',
+                '[contenteditable="true"]',
+                '[tabindex]:not([tabindex="-1"])'
+            ];
+            
+            const markers = [];
+            
+            selectors.forEach(selector => {
+                document.querySelectorAll(selector).forEach(element => {
+                    // Skip already marked elements
+                    if (element.hasAttribute('data-autowing-id')) {
+                        return;
+                    }
+                    
+                    // Generate unique ID
+                    const uniqueId = generateUniqueId();
+                    element.setAttribute('data-autowing-id', uniqueId);
+                    
+                    // Collect element information
+                    markers.push({
+                        id: uniqueId,
+                        tagName: element.tagName.toLowerCase(),
+                        type: element.getAttribute('type') || null,
+                        placeholder: element.getAttribute('placeholder') || null,
+                        value: element.value || null,
+                        textContent: element.textContent?.trim().substring(0, 100) || '',
+                        ariaLabel: element.getAttribute('aria-label') || null,
+                        role: element.getAttribute('role') || null,
+                        boundingBox: element.getBoundingClientRect()
+                    });
+                });
+            });
+            
+            return markers;
+        })();
+        """
+
+LEGACY_ELEMENTS_SCRIPT = """() => {
+            const getVisibleElements = () => {
+                const elements = [];
+                const selectors = [
+                    'input',
+                    'textarea',
+                    'select',
+                    'button',
+                    'a',
+                    '[role="button"]',
+                    '[role="link"]',
+                    '[role="checkbox"]',
+                    '[role="radio"]',
+                    '[role="searchbox"]',
+                    'summary',
+                    '[draggable="true"]'
+                ];
+                
+                for (const selector of selectors) {
+                    document.querySelectorAll(selector).forEach(el => {
+                        if (el.offsetWidth > 0 && el.offsetHeight > 0) {
+                            elements.push({
+                                tag: el.tagName.toLowerCase(),
+                                type: el.getAttribute('type') || null,
+                                placeholder: el.getAttribute('placeholder') || null,
+                                value: el.value || null,
+                                text: el.textContent?.trim() || '',
+                                aria: el.getAttribute('aria-label') || null,
+                                id: el.id || '',
+                                name: el.getAttribute('name') || null,
+                                class: el.className || '',
+                                draggable: el.getAttribute('draggable') || null,
+                                // New addition: include autowing marker ID
+                                autowingId: el.getAttribute('data-autowing-id') || null,
+                                // New addition: element position information
+                                boundingBox: {
+                                    x: el.getBoundingClientRect().x,
+                                    y: el.getBoundingClientRect().y,
+                                    width: el.getBoundingClientRect().width,
+                                    height: el.getBoundingClientRect().height
+                                }
+                            });
+                        }
+                    });
+                }
+                return elements;
+            };
+            return getVisibleElements();
+        }"""
+
+CLEAR_MARKERS_SCRIPT = """() => document.querySelectorAll('[data-autowing-id]')
+    .forEach(el => el.removeAttribute('data-autowing-id'))"""
+
+
+def legacy_capture(page) -> dict:
+    """Marker injection, URL, title and elements in separate calls"""
+    page.evaluate(LEGACY_MARKER_SCRIPT)
+    context = {"url": page.url, "title": page.title()}
+    context["elements"] = page.evaluate(LEGACY_ELEMENTS_SCRIPT)
+    return context
+
+
+def snapshot_capture(page) -> dict:
+    """Everything in one snapshot call"""
+    return json.loads(page.evaluate(f"({PAGE_SNAPSHOT_FUNCTION})", {"injectMarkers": True}))
+
+
+def viewport_capture(page) -> dict:
+    """Snapshot keeping the elements in or near the viewport"""
+    options = {"injectMarkers": True, "visibility": {"mode": "filter", "margin": 200}}
+    return json.loads(page.evaluate(f"({PAGE_SNAPSHOT_FUNCTION})", options))
+
+
+def bench(name: str, page, capture) -> float:
+    timings = []
+    for _ in range(ROUNDS):
+        page.evaluate(CLEAR_MARKERS_SCRIPT)
+        start = time.perf_counter()
+        context = capture(page)
+        timings.append(time.perf_counter() - start)
+    elements = context["elements"]
+    payload = len(json.dumps(elements, ensure_ascii=False).encode("utf-8"))
+    elapsed = statistics.median(timings)
+    print(f"{name:<10} {elapsed * 1000:>9.1f} ms {len(elements):>8} elements {payload / 1024:>9.0f} KiB")
+    return elapsed
+
+
+def main():
+    with sync_playwright() as p:
+        browser = p.chromium.launch()
+        page = browser.new_page()
+        page.set_content(SYNTHETIC_PAGE)
+        dom_size = page.evaluate("document.querySelectorAll('*').length")
+        print(f"{dom_size} DOM elements, median of {ROUNDS} runs")
+
+        baseline = bench("legacy", page, legacy_capture)
+        for name, capture in (("snapshot", snapshot_capture), ("viewport", viewport_capture)):
+            elapsed = bench(name, page, capture)
+            print(f"{'':<10} {baseline / elapsed:>9.1f}x")
+        browser.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Micro benchmark of the cache prompt vectorizer tokenizer.
+
+Compares the character by character tokenizer the vectorizer used before with the
+precompiled regex tokenizer and the memoized n-gram features, on mixed
+Chinese/English prompts.
+
+run:
+> python examples/benchmark_vectorizer.py
+"""
+import random
+import time
+
+from autowing.core.cache.cache_manager import HashingVectorizer
+
+STOP_PATTERNS = ['的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '一个']
+
+PROMPTS = [
+    '搜索框输入"playwright"关键字，并回车',
+    'search for "selenium" in the search box and press enter',
+    '点击登录按钮',
+    'click the login button',
+    '在用户名输入框中输入admin',
+    "fill the password field with 'secret' and submit the form",
+    '选择下拉框中的第二个选项',
+    '点击 Submit 按钮提交订单',
+    'open the 设置 menu and click 退出登录',
+    '勾选"记住我"复选框',
+]
+
+
+def legacy_generate_ngrams(text: str, n: int) -> list:
+    """The tokenizer and n-gram generation as implemented before"""
+    processed_text = text.lower()
+    for pattern in STOP_PATTERNS:
+        processed_text = processed_text.replace(pattern, '')
+    processed_text = processed_text.strip()
+
+    tokens = []
+    i = 0
+    while i < len(processed_text):
+        if '一' <= processed_text[i] <= '鿿':
+            tokens.append(processed_text[i])
+            i += 1
+        else:
+            if processed_text[i].isalnum():
+                word_start = i
+                while i < len(processed_text) and (processed_text[i].isalnum() or processed_text[i] == "'"):
+                    i += 1
+                if i > word_start:
+                    tokens.append(processed_text[word_start:i])
+            else:
+                i += 1
+
+    ngrams = []
+    for i in range(len(tokens) - n + 1):
+        ngram = ''.join(tokens[i:i + n]) if any('一' <= c <= '鿿' for c in ''.join(tokens[i:i + n])) else ' '.join(tokens[i:i + n])
+        if ngram.strip():
+            ngrams.append(ngram)
+    return ngrams
+
+
+def make_prompts(count: int, unique: int) -> list:
+    """Mixed prompts, `unique` distinct texts repeated up to `count` prompts"""
+    random.seed(2024)
+    distinct = [f"{random.choice(PROMPTS)} {random.choice(PROMPTS)} #{i}" for i in range(unique)]
+    return [distinct[i % unique] for i in range(count)]
+
+
+def bench(name: str, func, prompts: list) -> float:
+    start = time.perf_counter()
+    func(prompts)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<38} {len(prompts) / elapsed:>12,.0f} prompts/s")
+    return elapsed
+
+
+def main():
+    prompts = make_prompts(20000, 500)
+
+    def legacy(texts):
+        for text in texts:
+            for n in (1, 2):
+                legacy_generate_ngrams(text, n)
+
+    def regex(texts):
+        vectorizer = HashingVectorizer()
+        for text in texts:
+            for n in (1, 2):
+                vectorizer._generate_ngrams(text, n)
+
+    def once(texts):
+        vectorizer = HashingVectorizer()
+        vectorizer.ngram_cache_size = 0
+        for text in texts:
+            vectorizer._text_ngrams(text)
+
+    def memoized(texts):
+        vectorizer = HashingVectorizer()
+        for text in texts:
+            vectorizer._text_ngrams(text)
+
+    # Same n-grams, whichever tokenizer
+    vectorizer = HashingVectorizer()
+    for text in set(prompts):
+        assert list(vectorizer._text_ngrams(text)) == legacy_generate_ngrams(text, 1) + legacy_generate_ngrams(text, 2)
+
+    print(f"{len(prompts)} prompts, {len(set(prompts))} distinct")
+    baseline = bench("legacy tokenizer, per n", legacy, prompts)
+    for name, func in (("regex tokenizer, per n", regex),
+                       ("regex tokenizer, once for all n", once),
+                       ("regex tokenizer, once + LRU memo", memoized)):
+        elapsed = bench(name, func, prompts)
+        print(f"{'':<38} {baseline / elapsed:>11.1f}x")
+
+
+if __name__ == '__main__':
+    main()
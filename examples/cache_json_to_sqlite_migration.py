@@ -0,0 +1,65 @@
+"""
+Round trip of a compact JSON cache directory into the SQLite store.
+
+Fills a cache with storage="json" and the compact entry format, then reopens the
+same directory with the default SQLite storage, which migrates the JSON files,
+and checks that every prompt is still a cache hit in its page partition.
+No browser or LLM is needed.
+
+run:
+> python examples/cache_json_to_sqlite_migration.py
+"""
+import os
+import shutil
+import tempfile
+
+from autowing.core.cache.cache_manager import IntelligentCacheManager
+
+ENTRIES = [
+    ("https://shop.example.com/login?next=/orders", "click the login button",
+     {"selector": "#loginBtn", "action": "click"}),
+    ("https://shop.example.com/orders/42", "点击编辑按钮",
+     {"selector": "button.edit", "action": "click"}),
+    ("https://shop.example.com/search", 'search for "refund" and press enter',
+     {"selector": "#globalSearch", "action": "fill", "value": "refund", "key": "Enter"}),
+]
+
+
+def make_context(url: str) -> dict:
+    """Page context with a few elements"""
+    return {
+        "url": url,
+        "title": "Shop",
+        "elements": [
+            {"tag": "button", "id": "loginBtn", "text": "Log in"},
+            {"tag": "button", "class": "edit", "text": "编辑"},
+            {"tag": "input", "type": "search", "id": "globalSearch", "placeholder": "Search"},
+        ],
+    }
+
+
+def main():
+    cache_dir = tempfile.mkdtemp(prefix="autowing-migration-")
+    try:
+        manager = IntelligentCacheManager(cache_dir=cache_dir, storage="json", entry_format="compact")
+        for url, prompt, response in ENTRIES:
+            manager.set_intelligent(prompt, make_context(url), response)
+        manager.close()
+        json_files = [filename for filename in os.listdir(cache_dir) if filename.endswith('.json')]
+        print(f"{len(json_files)} compact JSON cache files written")
+
+        manager = IntelligentCacheManager(cache_dir=cache_dir, storage="sqlite")
+        try:
+            for url, prompt, response in ENTRIES:
+                cached = manager.get_intelligent(prompt, make_context(url))
+                print(f"{prompt[:40]:<40} {'hit' if cached == response else 'MISS'}")
+                assert cached == response, f"Migrated entry missed: {prompt}"
+        finally:
+            manager.close()
+        print("✅ Every migrated entry is a cache hit")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
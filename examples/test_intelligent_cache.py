@@ -4,18 +4,25 @@
 """
 import time
 import os
+import shutil
 from dotenv import load_dotenv
 from playwright.sync_api import sync_playwright
 
+from autowing.core.cache.cache_manager import IntelligentCacheManager
+from autowing.core.cache.storage import SQLiteStorage
 from autowing.playwright import create_fixture
 
 
 def count_cache_files():
-    """统计缓存文件数量"""
-    cache_dir = ".auto-wing/cache"
-    if not os.path.exists(cache_dir):
+    """统计缓存条目数量"""
+    db_path = ".auto-wing/cache/cache.db"
+    if not os.path.exists(db_path):
         return 0
-    return len([f for f in os.listdir(cache_dir) if f.endswith('.json')])
+    storage = SQLiteStorage(db_path)
+    try:
+        return storage.count()
+    finally:
+        storage.close()
 
 
 def test_cache_efficiency():
@@ -27,9 +34,7 @@ def test_cache_efficiency():
     # 清理现有缓存
     cache_dir = ".auto-wing/cache"
     if os.path.exists(cache_dir):
-        for f in os.listdir(cache_dir):
-            if f.endswith('.json'):
-                os.remove(os.path.join(cache_dir, f))
+        shutil.rmtree(cache_dir)
     
     initial_cache_count = count_cache_files()
     print(f"开始时缓存文件数: {initial_cache_count}")
@@ -38,8 +43,9 @@ def test_cache_efficiency():
         browser = p.chromium.launch(headless=False)  # 使用非无头模式便于观察
         page = browser.new_page()
 
-        # 创建AI fixture，设置较低的相似度阈值以便测试
+        # 创建AI fixture，使用独立的缓存管理器，修改相似度阈值不影响共享的缓存管理器
         ai_fixture = create_fixture()(page)
+        ai_fixture.cache_manager = IntelligentCacheManager(cache_dir=cache_dir)
 
         # 访问测试页面
         print("🌐 访问必应搜索页面...")
@@ -106,9 +112,11 @@ def test_cache_efficiency():
             stats = ai_fixture.get_cache_statistics()
             print(f"\n📊 缓存统计:")
             print(f"   总缓存条目: {stats['total_entries']}")
-            print(f"   总使用次数: {stats['total_usage']}")
+            print(f"   查询次数: {stats['lookups']}")
+            print(f"   精确命中: {stats['exact_hits']}, 语义命中: {stats['semantic_hits']}, 未命中: {stats['misses']}")
             print(f"   平均相似度: {stats['average_similarity']:.2f}")
             print(f"   命中率: {stats['hit_rate']:.2f}")
+            print(f"   节省LLM耗时: {stats['llm_time_saved']:.2f}秒, 节省tokens(估算): {stats['tokens_saved']}")
         except Exception as e:
             print(f"❌ 获取缓存统计失败: {e}")
 
@@ -117,6 +125,7 @@ def test_cache_efficiency():
             speedup = first_duration / second_duration
             print(f"\n⚡ 性能提升: {speedup:.1f}x (缓存 vs 首次)")
 
+        ai_fixture.cache_manager.close()
         browser.close()
 
         # 最终统计
@@ -223,7 +232,7 @@ def test_different_similarity_thresholds():
                     duration = time.time() - start_time
                     
                     stats = ai_fixture.get_cache_statistics()
-                    hit = stats['total_usage'] > stats['total_entries']  # 有缓存命中
+                    hit = stats['hits'] > stats_before['hits']  # 有缓存命中
                     
                     results.append({
                         'threshold': threshold,